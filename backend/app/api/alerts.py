@@ -1,63 +1,96 @@
+import base64
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select, and_, func, desc
+from dataclasses import asdict
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, and_, desc, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
-from app.core.database import get_db
-from app.models.models import (
-    User, VelocityAlert, AlertStatus, AlertUrgency,
-    CreatorPost, TrackedCreator
-)
+from app.core.config import settings
+from app.core.database import get_db, get_read_db, read_session
+from app.models.models import User, VelocityAlert, AlertStatus
 from app.schemas.schemas import (
     AlertResponse, AlertFeedResponse, VelocityFeedItem,
-    VelocityFeedResponse, TriggerScanRequest, TriggerScanResponse,
+    VelocityFeedResponse, ScanJobResponse,
 )
-from app.services.scanner import run_velocity_scan
+from app.services.alert_counts import load_status_counts, set_alert_status
+from app.services.event_stream import event_broker
+from app.services.response_cache import cached_response
+from app.services.scan_jobs import ScanJob, scan_jobs
+from app.services.velocity_feed import load_velocity_feed
 
 router = APIRouter(prefix="/users/{user_id}", tags=["alerts"])
 
 
 @router.get("/alerts", response_model=AlertFeedResponse)
 async def get_alerts(
+    request: Request,
     user_id: int,
     urgency: str | None = Query(None, description="Filter by urgency level"),
     status: str | None = Query(None, description="Filter by alert status"),
-    limit: int = Query(20, le=100),
-    db: AsyncSession = Depends(get_db),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = Query(None, description="next_cursor from the previous page"),
+    db: AsyncSession = Depends(get_read_db),
 ):
+    return await cached_response(
+        request,
+        user_id,
+        AlertFeedResponse,
+        lambda: _load_alert_page(db, user_id, urgency, status, limit, cursor),
+    )
+
+
+async def _load_alert_page(
+    db: AsyncSession,
+    user_id: int,
+    urgency: str | None,
+    status: str | None,
+    limit: int,
+    cursor: str | None,
+) -> AlertFeedResponse:
     conditions = [VelocityAlert.user_id == user_id]
     if urgency:
         conditions.append(VelocityAlert.urgency == urgency)
     if status:
         conditions.append(VelocityAlert.status == status)
+    if cursor:
+        # Keyset: strictly older than the last alert of the previous page
+        conditions.append(
+            tuple_(VelocityAlert.created_at, VelocityAlert.id) < _decode_cursor(cursor)
+        )
 
     result = await db.execute(
         select(VelocityAlert)
         .where(and_(*conditions))
-        .order_by(desc(VelocityAlert.created_at))
-        .limit(limit)
+        .order_by(desc(VelocityAlert.created_at), desc(VelocityAlert.id))
+        .limit(limit + 1)
     )
     alerts = result.scalars().all()
-
-    total_result = await db.execute(
-        select(func.count()).select_from(VelocityAlert).where(
-            VelocityAlert.user_id == user_id
-        )
+    next_cursor = _encode_cursor(alerts[limit - 1]) if len(alerts) > limit else None
+
+    status_counts = await load_status_counts(db, user_id)
+    return AlertFeedResponse(
+        alerts=alerts[:limit],
+        total=sum(status_counts.values()),
+        pending_count=status_counts[AlertStatus.PENDING.value],
+        status_counts=status_counts,
+        next_cursor=next_cursor,
     )
-    total = total_result.scalar() or 0
 
-    pending_result = await db.execute(
-        select(func.count()).select_from(VelocityAlert).where(
-            and_(
-                VelocityAlert.user_id == user_id,
-                VelocityAlert.status == AlertStatus.PENDING,
-            )
-        )
-    )
-    pending = pending_result.scalar() or 0
 
-    return AlertFeedResponse(alerts=alerts, total=total, pending_count=pending)
+def _encode_cursor(alert: VelocityAlert) -> str:
+    raw = f"{alert.created_at.isoformat()}|{alert.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, alert_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(alert_id)
+    except ValueError:
+        raise HTTPException(400, "Invalid cursor")
 
 
 @router.get("/alerts/{alert_id}", response_model=AlertResponse)
@@ -78,8 +111,9 @@ async def get_alert_detail(
     if not alert:
         raise HTTPException(404, "Alert not found")
     if alert.status == AlertStatus.PENDING:
-        alert.status = AlertStatus.OPENED
-        alert.opened_at = datetime.utcnow()
+        await set_alert_status(
+            db, alert, AlertStatus.OPENED, opened_at=datetime.utcnow()
+        )
         await db.commit()
     return alert
 
@@ -101,7 +135,7 @@ async def mark_alert_acted(
     alert = result.scalar_one_or_none()
     if not alert:
         raise HTTPException(404, "Alert not found")
-    alert.status = AlertStatus.ACTED_ON
+    await set_alert_status(db, alert, AlertStatus.ACTED_ON)
     await db.commit()
     return {"status": "marked_acted"}
 
@@ -123,87 +157,99 @@ async def dismiss_alert(
     alert = result.scalar_one_or_none()
     if not alert:
         raise HTTPException(404, "Alert not found")
-    alert.status = AlertStatus.DISMISSED
+    await set_alert_status(db, alert, AlertStatus.DISMISSED)
     await db.commit()
     return {"status": "dismissed"}
 
 
 @router.get("/velocity-feed", response_model=VelocityFeedResponse)
 async def get_velocity_feed(
+    request: Request,
     user_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """Real-time velocity feed showing all tracked creator posts ranked by multiplier."""
-    creators_result = await db.execute(
-        select(TrackedCreator).where(
-            and_(
-                TrackedCreator.user_id == user_id,
-                TrackedCreator.is_active == True,
-            )
+    async def build():
+        feed = await load_velocity_feed(db, user_id)
+        return VelocityFeedResponse(
+            items=[VelocityFeedItem(**item) for item in feed["items"]],
+            spike_count=feed["spike_count"],
+            last_scan_at=feed["last_scan_at"],
         )
-    )
-    creators = creators_result.scalars().all()
-    creator_ids = [c.id for c in creators]
-    creator_map = {c.id: c for c in creators}
-
-    if not creator_ids:
-        return VelocityFeedResponse(items=[], spike_count=0, last_scan_at=None)
-
-    posts_result = await db.execute(
-        select(CreatorPost)
-        .where(CreatorPost.creator_id.in_(creator_ids))
-        .order_by(desc(CreatorPost.velocity_multiplier))
-        .limit(50)
-    )
-    posts = posts_result.scalars().all()
 
-    alert_post_ids_result = await db.execute(
-        select(VelocityAlert.post_id).where(VelocityAlert.user_id == user_id)
-    )
-    alert_post_ids = {row[0] for row in alert_post_ids_result.all()}
-
-    items = []
-    spike_count = 0
-    for post in posts:
-        creator = creator_map.get(post.creator_id)
-        is_spike = post.is_spike or False
-        if is_spike:
-            spike_count += 1
-        items.append(VelocityFeedItem(
-            creator_handle=creator.instagram_handle if creator else "unknown",
-            creator_name=creator.display_name if creator else None,
-            post_url=post.post_url,
-            caption_preview=(post.caption or "")[:120],
-            views=post.views,
-            velocity_multiplier=post.velocity_multiplier or 0,
-            hours_since_post=post.hours_since_post or 0,
-            detected_format=post.detected_format,
-            is_spike=is_spike,
-            alert_generated=post.id in alert_post_ids,
-        ))
-
-    last_scan = max(
-        (c.last_scraped_at for c in creators if c.last_scraped_at), default=None
+    return await cached_response(request, user_id, VelocityFeedResponse, build)
+
+
+@router.get("/stream")
+async def stream_events(
+    user_id: int,
+    last_event_id: str | None = Header(None),
+    resume_from: str | None = Query(
+        None, alias="last_event_id", description="Last event id seen, if no header"
+    ),
+):
+    """
+    Server-Sent Events stream of the user's new alerts (`alert`) and velocity
+    feed updates (`velocity_feed`). Reconnects resume after `Last-Event-ID`;
+    a `resync` event means the gap was too old and the client should refetch.
+    """
+    # A short-lived session: the stream itself holds no connection
+    async with read_session() as db:
+        if await db.get(User, user_id) is None:
+            raise HTTPException(404, "User not found")
+
+    subscription = event_broker.subscribe(
+        user_id, _parse_event_id(last_event_id or resume_from)
     )
-    return VelocityFeedResponse(
-        items=items, spike_count=spike_count, last_scan_at=last_scan
+    return StreamingResponse(
+        event_broker.stream(subscription, settings.stream_heartbeat_seconds),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
-@router.post("/scan", response_model=TriggerScanResponse)
+def _parse_event_id(value: str | None) -> int | None:
+    # An unparseable id is treated as a fresh connection
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+@router.post("/scan", response_model=ScanJobResponse, status_code=202)
 async def trigger_scan(
     user_id: int,
     db: AsyncSession = Depends(get_db),
 ):
-    """Manually trigger a velocity scan for a user. Used for demos and testing."""
+    """
+    Manually trigger a velocity scan for a user. Used for demos and testing.
+
+    Returns a job immediately; poll `GET /scan/{job_id}` for progress. A
+    scan already running for the user is returned instead of a new one.
+    """
     user = await db.execute(select(User).where(User.id == user_id))
     if not user.scalar_one_or_none():
         raise HTTPException(404, "User not found")
 
-    result = await run_velocity_scan(user_id=user_id)
-    return TriggerScanResponse(
-        posts_scanned=result["posts_scanned"],
-        spikes_detected=result["spikes_detected"],
-        alerts_generated=result["alerts_generated"],
-        alerts=result["alerts"],
+    return _scan_job_response(scan_jobs.submit(user_id))
+
+
+@router.get("/scan/{job_id}", response_model=ScanJobResponse)
+async def get_scan_job(user_id: int, job_id: str):
+    job = scan_jobs.get(job_id)
+    if job is None or job.user_id != user_id:
+        raise HTTPException(404, "Scan job not found")
+    return _scan_job_response(job)
+
+
+def _scan_job_response(job: ScanJob) -> ScanJobResponse:
+    return ScanJobResponse(
+        job_id=job.id,
+        status=job.status,
+        alert_ids=job.alert_ids,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        **asdict(job.progress),
     )
@@ -1,11 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+from math import ceil
+
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy import select, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import get_db, get_read_db
 from app.models.models import User, TrackedCreator
 from app.schemas.schemas import TrackedCreatorCreate, TrackedCreatorResponse
-from app.services.instagram import get_scraper, ingest_creator_posts
+from app.services.instagram import get_scraper, ingest_creator_posts, get_canonical_creator
+from app.services.velocity import VelocityEngine
+from app.services.rate_limit import ScraperThrottled
+from app.services.response_cache import cached_response
+from app.services.velocity_feed import refresh_velocity_feeds, refresh_feeds_for_handle
 
 router = APIRouter(prefix="/users/{user_id}/creators", tags=["tracked creators"])
 
@@ -31,8 +38,20 @@ async def track_creator(
     if existing.scalar_one_or_none():
         raise HTTPException(400, "Already tracking this creator")
 
+    # Fetch before writing anything, so a throttled scraper leaves no
+    # half-tracked creator behind
     scraper = get_scraper()
-    profile = await scraper.fetch_creator_profile(payload.instagram_handle)
+    try:
+        profile = await scraper.fetch_creator_profile(payload.instagram_handle)
+        raw_posts = await scraper.fetch_recent_posts(
+            payload.instagram_handle, max_posts=settings.baseline_post_count
+        )
+    except ScraperThrottled as e:
+        raise HTTPException(
+            503,
+            "Instagram is rate limiting requests, try again shortly",
+            headers={"Retry-After": str(max(ceil(e.retry_after), 1))},
+        )
 
     creator = TrackedCreator(
         user_id=user_id,
@@ -44,25 +63,38 @@ async def track_creator(
     await db.commit()
     await db.refresh(creator)
 
-    await ingest_creator_posts(db, creator)
+    await ingest_creator_posts(db, creator, raw_posts)
+    # Score the fresh posts before materializing them, or a new handle's
+    # feed items would be served with empty multipliers until its next scan
+    owner = await get_canonical_creator(db, creator.instagram_handle)
+    await VelocityEngine().analyze_creators(db, [owner])
+    # Fresh posts change the feed of everyone tracking this handle
+    await refresh_feeds_for_handle(db, creator.instagram_handle)
+    await db.commit()
 
     return creator
 
 
 @router.get("/", response_model=list[TrackedCreatorResponse])
 async def list_tracked_creators(
+    request: Request,
     user_id: int,
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    result = await db.execute(
-        select(TrackedCreator).where(
-            and_(
-                TrackedCreator.user_id == user_id,
-                TrackedCreator.is_active == True,
+    async def build():
+        result = await db.execute(
+            select(TrackedCreator).where(
+                and_(
+                    TrackedCreator.user_id == user_id,
+                    TrackedCreator.is_active == True,
+                )
             )
         )
+        return result.scalars().all()
+
+    return await cached_response(
+        request, user_id, list[TrackedCreatorResponse], build
     )
-    return result.scalars().all()
 
 
 @router.delete("/{creator_id}")
@@ -83,5 +115,6 @@ async def untrack_creator(
     if not creator:
         raise HTTPException(404, "Creator not found")
     creator.is_active = False
+    await refresh_velocity_feeds(db, [user_id])
     await db.commit()
     return {"status": "untracked"}
@@ -4,10 +4,16 @@ from pathlib import Path
 
 class Settings(BaseSettings):
     database_url: str = "sqlite+aiosqlite:///./velocity_alerts.db"
+    # GET endpoints read through this (e.g. a replica); empty = database_url, read-only
+    read_database_url: str = ""
     openai_api_key: str = ""
+    # Any OpenAI-compatible endpoint (e.g. a local fake server); empty = api.openai.com
+    openai_base_url: str = ""
+    openai_model: str = "gpt-4o-mini"
     instagram_session_id: str = ""
     firebase_credentials_path: str = ""
 
+    # Base polling interval (creators with a fresh post but no spike)
     polling_interval_minutes: int = 30
     velocity_spike_threshold: float = 2.5
     alert_cooldown_hours: int = 6
@@ -18,6 +24,115 @@ class Settings(BaseSettings):
     min_views_threshold: int = 1000
     # How many historical posts to use for baseline
     baseline_post_count: int = 20
+    # Scans fetch only posts inside the analysis window; the full baseline
+    # set is re-fetched this often to keep older posts' engagement current
+    baseline_refresh_hours: int = 24
+
+    # Adaptive polling: how often to check for due creators, and how many per tick
+    poll_tick_seconds: int = 60
+    poll_max_handles_per_tick: int = 200
+    # Accelerating spike on a post younger than poll_hot_post_hours
+    poll_interval_hot_minutes: int = 5
+    poll_hot_post_hours: float = 6.0
+    # Any other spike in the detection window
+    poll_interval_spiking_minutes: int = 15
+    # Newest post older than poll_fresh_post_hours / poll_dormant_after_days
+    poll_fresh_post_hours: float = 24.0
+    poll_interval_quiet_minutes: int = 120
+    poll_dormant_after_days: int = 7
+    poll_interval_dormant_minutes: int = 360
+
+    # Max creators scanned in parallel (each task gets its own DB session)
+    scan_concurrency: int = 8
+    # Seconds a single creator's fetch and ingest may take before it's abandoned
+    scan_creator_timeout_seconds: float = 120.0
+    # Threads dedicated to blocking instaloader calls
+    scraper_max_workers: int = 4
+    # Seconds before a single scraper call is abandoned
+    scraper_call_timeout_seconds: float = 60.0
+    # Shared budget for live Instagram calls across all scan workers
+    scraper_rate_per_minute: float = 30.0
+    scraper_rate_burst: int = 5
+    # HTTP 429s are retried with exponential backoff (base * 2^attempt, capped)
+    scraper_max_retries: int = 3
+    scraper_backoff_base_seconds: float = 2.0
+    scraper_backoff_max_seconds: float = 60.0
+    # Consecutive 429s that pause all scraping, and for how long
+    scraper_breaker_failure_threshold: int = 5
+    scraper_breaker_cooldown_seconds: float = 600.0
+    # Resolved instaloader Profiles are reused for this long (saves a lookup per
+    # fetch). A Profile holds the newest posts its metadata lookup returned, so
+    # keep this under poll_interval_hot_minutes or rescans see stale views
+    scraper_profile_cache_ttl_minutes: int = 4
+    # Profile metadata (name, followers, bio) changes slowly; cache it longer
+    scraper_metadata_cache_ttl_minutes: int = 360
+    scraper_profile_cache_max_entries: int = 1024
+    # Manually triggered scans run as background jobs; at most this many at once
+    scan_job_max_concurrency: int = 2
+    # Finished scan jobs stay pollable for this long
+    scan_job_ttl_minutes: int = 60
+
+    # Live stream (SSE): events kept per user for Last-Event-ID resume
+    stream_replay_events: int = 200
+    # Events a connection may fall behind before it is dropped (it then resumes)
+    stream_queue_size: int = 100
+    stream_heartbeat_seconds: float = 15.0
+
+    # Dashboard reads (alerts, velocity feed, creators) are cached per user
+    # until their data changes; the TTL is only a backstop
+    response_cache_ttl_seconds: float = 300.0
+    response_cache_max_entries: int = 4096
+
+    # Posts kept in each user's materialized velocity feed
+    velocity_feed_size: int = 50
+
+    # Max concurrent draft rewrite requests to the LLM
+    draft_max_concurrency: int = 8
+    # Seconds one draft request may take once it has a slot; a request that
+    # runs over falls back to the template draft
+    draft_request_timeout_seconds: float = 30.0
+    # Generated drafts are reused for the same post/format/hook/pillars
+    draft_cache_ttl_minutes: int = 360
+    draft_cache_max_entries: int = 2048
+
+    # Push delivery: "auto" (FCM if configured, else log), "fcm", "log" or "fake"
+    push_transport: str = "auto"
+    # Alerts per delivery batch (FCM caps send_each at 500)
+    push_batch_size: int = 500
+    # Seconds between queue polls when nothing wakes the dispatcher
+    push_poll_interval_seconds: float = 5.0
+    # Failed pushes are retried with exponential backoff, then marked FAILED
+    push_max_attempts: int = 5
+    push_retry_base_seconds: float = 30.0
+
+    # Connection pool for server databases (postgresql+asyncpg); SQLite ignores these
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    # Seconds a request waits for a free connection before erroring
+    db_pool_timeout_seconds: float = 30.0
+    # Reconnect before server/proxy idle timeouts drop pooled connections
+    db_pool_recycle_seconds: int = 1800
+
+    # SQLite tuning profile, applied to every new connection
+    sqlite_journal_mode: str = "wal"
+    # How long a connection waits on a lock before "database is locked"
+    sqlite_busy_timeout_ms: int = 5000
+    # NORMAL is durable under WAL except for the last commits on power loss
+    sqlite_synchronous: str = "normal"
+    sqlite_mmap_size_mb: int = 256
+    sqlite_cache_size_mb: int = 64
+    sqlite_temp_store: str = "memory"
+    # Scanner writes queue on an in-process lock rather than SQLite's busy loop
+    sqlite_serialize_writes: bool = True
+
+    # Snapshot retention: every snapshot inside the detection window,
+    # then the last one per hour, then per day, then none
+    snapshot_full_resolution_hours: int = 72
+    snapshot_hourly_retention_days: int = 7
+    snapshot_daily_retention_days: int = 30
+    snapshot_retention_interval_minutes: int = 60
+    # Posts handled per retention transaction
+    snapshot_retention_batch_size: int = 500
 
     model_config = {"env_file": ".env", "extra": "ignore"}
 
@@ -1,21 +1,152 @@
+"""
+Engines and sessions.
+
+On SQLite every new connection gets the tuning profile from settings (WAL
+journal, busy timeout, synchronous=NORMAL, mmap, page cache, in-memory temp
+tables), so the scanner's writes and the dashboard's reads stop tripping
+over each other:
+
+- `engine` / `get_db`: read-write sessions
+- `read_engine` / `get_read_db`: sessions for GET endpoints on connections
+  opened with `query_only`; under WAL they read a snapshot and never wait
+  on a writer (`read_database_url` may point them at a replica instead)
+- `write_lock`: background writers (the scanner) queue on this instead of
+  racing for SQLite's single writer slot and burning the busy timeout
+
+Server databases (postgresql+asyncpg) get a sized, pre-pinged, recycled
+connection pool instead, and `bulk_insert` streams large batches with COPY.
+"""
+import asyncio
+from contextlib import nullcontext
+
+from sqlalchemy import event, insert, select
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 
 from app.core.config import settings
 
-engine = create_async_engine(settings.database_url, echo=False)
+_url = make_url(settings.database_url)
+IS_SQLITE = _url.get_backend_name() == "sqlite"
+# An in-memory database exists per connection pool, so it can't be shared
+_IN_MEMORY = IS_SQLITE and _url.database in (None, "", ":memory:")
+
+
+def _sqlite_pragmas(read_only: bool = False) -> list[str]:
+    pragmas = [
+        f"PRAGMA journal_mode={settings.sqlite_journal_mode}",
+        f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}",
+        f"PRAGMA synchronous={settings.sqlite_synchronous}",
+        f"PRAGMA mmap_size={settings.sqlite_mmap_size_mb * 1024 * 1024}",
+        # Negative cache_size is in KiB rather than pages
+        f"PRAGMA cache_size=-{settings.sqlite_cache_size_mb * 1024}",
+        f"PRAGMA temp_store={settings.sqlite_temp_store}",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+    return pragmas
+
+
+def _apply_sqlite_profile(sync_engine, read_only: bool = False):
+    pragmas = _sqlite_pragmas(read_only)
+
+    @event.listens_for(sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+def _create_engine(url: str):
+    if make_url(url).get_backend_name() == "sqlite":
+        return create_async_engine(url, echo=False)
+    return create_async_engine(
+        url,
+        echo=False,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout_seconds,
+        pool_recycle=settings.db_pool_recycle_seconds,
+        pool_pre_ping=True,
+    )
+
+
+engine = _create_engine(settings.database_url)
+if IS_SQLITE:
+    _apply_sqlite_profile(engine.sync_engine)
+
+if settings.read_database_url:
+    read_engine = _create_engine(settings.read_database_url)
+elif IS_SQLITE and not _IN_MEMORY:
+    read_engine = create_async_engine(settings.database_url, echo=False)
+    _apply_sqlite_profile(read_engine.sync_engine, read_only=True)
+else:
+    read_engine = engine
+
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+read_session = async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+
+# SQLite has one writer slot; elsewhere concurrent writers are fine
+write_lock = (
+    asyncio.Lock() if IS_SQLITE and settings.sqlite_serialize_writes else nullcontext()
+)
 
 
 class Base(DeclarativeBase):
     pass
 
 
+# Max values bound into a single IN (...) clause
+QUERY_CHUNK_SIZE = 1000
+
+
+def chunked(items: list, size: int = QUERY_CHUNK_SIZE):
+    """Split a list of ids into IN-clause sized chunks."""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+async def bulk_insert(db: AsyncSession, model: type[Base], rows: list[dict]):
+    """
+    Insert many rows in the session's transaction: COPY on asyncpg (no
+    per-row bind parameters), one executemany INSERT elsewhere. Every row
+    must have the same keys.
+    """
+    if not rows:
+        return
+    if db.get_bind().dialect.driver != "asyncpg":
+        await db.execute(insert(model), rows)
+        return
+    columns = list(rows[0])
+    raw = await (await db.connection()).get_raw_connection()
+    if not raw.driver_connection.is_in_transaction():
+        # The asyncpg adapter only sends BEGIN with its first statement
+        await db.execute(select(1))
+    await raw.driver_connection.copy_records_to_table(
+        model.__table__.name,
+        records=[tuple(row[column] for column in columns) for row in rows],
+        columns=columns,
+        schema_name=model.__table__.schema,
+    )
+
+
 async def get_db():
     async with async_session() as session:
         yield session
 
 
+async def get_read_db():
+    async with read_session() as session:
+        yield session
+
+
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+
+
+async def dispose_engines():
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
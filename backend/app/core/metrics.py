@@ -0,0 +1,212 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+`/health` reports point-in-time state; `/metrics` reports how long things
+take, so scans that run long can be pinned on a stage (scraping, DB ingest,
+detection, cooldown lookups, LLM drafts, pushes) and workers sized from real
+numbers. The scanner and push queue record into the module-level metrics
+below, and `render()` serializes them for Prometheus to scrape.
+
+Only counters, gauges and cumulative histograms are needed, so they are
+implemented here rather than pulling in a client library. Values live in this
+process and reset on restart, which Prometheus' rate() handles.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from math import inf
+
+from app.core.config import settings
+
+# Seconds; stages range from a cached draft (ms) to a slow scrape (minutes)
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300,
+)
+# Seconds a creator waited past its poll time
+LAG_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200)
+
+
+def _label_key(labelnames: tuple[str, ...], labels: dict[str, str]) -> tuple[str, ...]:
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {tuple(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(pairs: list[tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return "+Inf" if value == inf else repr(float(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def header(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [
+            f"{self.name}{_format_labels(list(zip(self.labelnames, key)))} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def set(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DURATION_BUCKETS,
+    ):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (inf,)
+        # Per label set: (count per bucket, non-cumulative), sum, count
+        self._values: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the `with` block (exceptions included)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            values = {key: (list(b), s, c) for key, (b, s, c) in self._values.items()}
+        lines = []
+        for key, (bucket_counts, total, count) in sorted(values.items()):
+            pairs = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(pairs + [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(pairs)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(pairs)} {count}")
+        return lines
+
+
+REGISTRY: list[_Metric] = []
+
+
+def _register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+SCAN_STAGE_SECONDS = _register(Histogram(
+    "stanley_scan_stage_duration_seconds",
+    "Time spent per call in each scan stage "
+    "(scrape, ingest, detect, cooldown, draft, alert, push).",
+    ("stage",),
+))
+SCAN_DURATION_SECONDS = _register(Histogram(
+    "stanley_scan_duration_seconds",
+    "Wall time of a whole scan cycle.",
+))
+CREATOR_SCAN_SECONDS = _register(Histogram(
+    "stanley_creator_scan_duration_seconds",
+    "Time to fetch and ingest one creator handle.",
+))
+CREATOR_SCANS = _register(Counter(
+    "stanley_creator_scans_total",
+    "Per-creator scan tasks by stage and outcome (ok, throttled, timeout, error).",
+    ("stage", "outcome"),
+))
+SCAN_LAG_SECONDS = _register(Histogram(
+    "stanley_scan_lag_seconds",
+    "How long a due creator waited past its next poll time before being scanned.",
+    buckets=LAG_BUCKETS,
+))
+SCAN_LAG_MAX_SECONDS = _register(Gauge(
+    "stanley_scan_lag_max_seconds",
+    "Largest poll lag among the creators of the latest poll tick.",
+))
+POLL_INTERVAL_SECONDS = _register(Gauge(
+    "stanley_polling_interval_seconds",
+    "Configured base polling interval, to compare scan lag against.",
+))
+POLL_INTERVAL_SECONDS.set(settings.polling_interval_minutes * 60)
+SCAN_ITEMS = _register(Counter(
+    "stanley_scan_items_total",
+    "Posts scanned, spikes detected and alerts generated by scans.",
+    ("kind",),
+))
+SCRAPER_POOL_TASKS = _register(Gauge(
+    "stanley_scraper_pool_tasks",
+    "Blocking scraper calls queued for or running on the scraper threads.",
+    ("state",),
+))
+PUSH_RESULTS = _register(Counter(
+    "stanley_push_results_total",
+    "Push deliveries by result (sent, retried, dead_lettered).",
+    ("result",),
+))
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text format (version 0.0.4)."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.header())
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
@@ -1,16 +1,27 @@
 import logging
 from contextlib import asynccontextmanager
+from dataclasses import asdict
 
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 from app.core.config import settings
-from app.core.database import init_db
+from app.core.database import init_db, dispose_engines
+from app.core.metrics import SCRAPER_POOL_TASKS, render as render_metrics
 from app.api.users import router as users_router
 from app.api.creators import router as creators_router
 from app.api.alerts import router as alerts_router
-from app.services.scanner import run_velocity_scan
+from app.services.scanner import run_due_scans
+from app.services.scrape_executor import scrape_executor
+from app.services.instagram import scraper_stats
+from app.services.retention import run_snapshot_retention, retention_progress
+from app.services.content_rewriter import draft_cache, close_client
+from app.services.push_queue import push_dispatcher
+from app.services.scan_jobs import scan_jobs
+from app.services.event_stream import event_broker
+from app.services.response_cache import response_cache
 
 logging.basicConfig(
     level=logging.INFO,
@@ -27,21 +38,37 @@ async def lifespan(app: FastAPI):
     logger.info("Database initialized")
 
     scheduler.add_job(
-        run_velocity_scan,
+        run_due_scans,
         "interval",
-        minutes=settings.polling_interval_minutes,
+        seconds=settings.poll_tick_seconds,
         id="velocity_scan",
-        name="Velocity Scan",
+        name="Velocity Scan (due creators)",
+        replace_existing=True,
+    )
+    scheduler.add_job(
+        run_snapshot_retention,
+        "interval",
+        minutes=settings.snapshot_retention_interval_minutes,
+        id="snapshot_retention",
+        name="Snapshot Retention",
         replace_existing=True,
     )
     scheduler.start()
+    push_dispatcher.start()
     logger.info(
-        f"Velocity scanner started (every {settings.polling_interval_minutes} min)"
+        f"Velocity scanner started (checking for due creators every "
+        f"{settings.poll_tick_seconds}s)"
     )
 
     yield
 
     scheduler.shutdown()
+    await scan_jobs.shutdown()
+    await push_dispatcher.stop()
+    event_broker.close_all()
+    scrape_executor.shutdown()
+    await close_client()
+    await dispose_engines()
     logger.info("Scheduler stopped")
 
 
@@ -75,4 +102,23 @@ async def health():
         "scanner_running": scheduler.running,
         "polling_interval_min": settings.polling_interval_minutes,
         "spike_threshold": settings.velocity_spike_threshold,
+        "scraper_pool": scrape_executor.stats(),
+        "scraper": scraper_stats(),
+        "snapshot_retention": asdict(retention_progress),
+        "draft_cache": draft_cache.stats(),
+        "push_queue": asdict(push_dispatcher.stats),
+        "scan_jobs": scan_jobs.stats(),
+        "event_stream": event_broker.stats(),
+        "response_cache": response_cache.stats(),
     }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Scan stage timings and counters in the Prometheus text format."""
+    pool = scrape_executor.stats()
+    SCRAPER_POOL_TASKS.set(pool["queue_depth"], state="queued")
+    SCRAPER_POOL_TASKS.set(pool["running"], state="running")
+    return PlainTextResponse(
+        render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -1,12 +1,17 @@
 from datetime import datetime
 from sqlalchemy import (
-    String, Integer, Float, Text, Boolean, DateTime, ForeignKey, JSON, Enum as SAEnum
+    String, Integer, Float, Text, Boolean, DateTime, ForeignKey, JSON, Index,
+    Enum as SAEnum,
 )
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 import enum
 
 from app.core.database import Base
 
+# JSONB on Postgres (binary, indexable), plain JSON text elsewhere
+JSONType = JSON().with_variant(JSONB(), "postgresql")
+
 
 class AlertUrgency(str, enum.Enum):
     CRITICAL = "critical"   # 5x+ multiplier, first 2 hours
@@ -22,6 +27,7 @@ class AlertStatus(str, enum.Enum):
     ACTED_ON = "acted_on"
     DISMISSED = "dismissed"
     EXPIRED = "expired"
+    FAILED = "failed"  # push delivery gave up (dead letter)
 
 
 class User(Base):
@@ -30,8 +36,8 @@ class User(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     username: Mapped[str] = mapped_column(String(255), unique=True, index=True)
     instagram_handle: Mapped[str | None] = mapped_column(String(255))
-    content_pillars: Mapped[dict | None] = mapped_column(JSON)
-    niche_tags: Mapped[list | None] = mapped_column(JSON)
+    content_pillars: Mapped[dict | None] = mapped_column(JSONType)
+    niche_tags: Mapped[list | None] = mapped_column(JSONType)
     push_token: Mapped[str | None] = mapped_column(Text)
     notification_enabled: Mapped[bool] = mapped_column(Boolean, default=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -52,7 +58,20 @@ class TrackedCreator(Base):
     avg_views: Mapped[float | None] = mapped_column(Float)
     avg_likes: Mapped[float | None] = mapped_column(Float)
     avg_comments: Mapped[float | None] = mapped_column(Float)
+    # Robust baseline over the same window (used by VelocityEngine)
+    median_views: Mapped[float | None] = mapped_column(Float)
+    mad_views: Mapped[float | None] = mapped_column(Float)
+    # Last `baseline_post_count` posts: post_id -> [posted_at, views, likes, comments]
+    baseline_window: Mapped[dict | None] = mapped_column(JSONType)
     last_scraped_at: Mapped[datetime | None] = mapped_column(DateTime)
+    # Last full (non-incremental) fetch of the baseline posts
+    baseline_refreshed_at: Mapped[datetime | None] = mapped_column(DateTime)
+    # High-water mark: publish time of the newest post seen so far
+    last_seen_post_at: Mapped[datetime | None] = mapped_column(DateTime)
+    # Adaptive polling: when this handle is next due (new rows are due at once)
+    next_poll_at: Mapped[datetime | None] = mapped_column(
+        DateTime, default=datetime.utcnow, index=True
+    )
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
@@ -63,9 +82,15 @@ class TrackedCreator(Base):
 class CreatorPost(Base):
     """Individual post snapshot with engagement metrics over time."""
     __tablename__ = "creator_posts"
+    __table_args__ = (
+        # Velocity analysis: a creator's posts inside the window, newest first
+        Index("ix_creator_posts_creator_posted", "creator_id", "posted_at"),
+        # Velocity feed: a creator's posts ranked by multiplier
+        Index("ix_creator_posts_creator_multiplier", "creator_id", "velocity_multiplier"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    creator_id: Mapped[int] = mapped_column(ForeignKey("tracked_creators.id"), index=True)
+    creator_id: Mapped[int] = mapped_column(ForeignKey("tracked_creators.id"))
     instagram_post_id: Mapped[str] = mapped_column(String(255), unique=True, index=True)
     post_url: Mapped[str | None] = mapped_column(Text)
     caption: Mapped[str | None] = mapped_column(Text)
@@ -87,7 +112,7 @@ class CreatorPost(Base):
     # Content analysis
     detected_format: Mapped[str | None] = mapped_column(String(100))  # listicle, storytime, etc.
     detected_hook_type: Mapped[str | None] = mapped_column(String(100))
-    content_analysis: Mapped[dict | None] = mapped_column(JSON)
+    content_analysis: Mapped[dict | None] = mapped_column(JSONType)
 
     first_seen_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     last_updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -99,9 +124,13 @@ class CreatorPost(Base):
 class PostSnapshot(Base):
     """Point-in-time engagement capture for velocity calculation."""
     __tablename__ = "post_snapshots"
+    __table_args__ = (
+        # Trailing snapshots per post (velocity) and retention bucketing
+        Index("ix_post_snapshots_post_captured", "post_id", "captured_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    post_id: Mapped[int] = mapped_column(ForeignKey("creator_posts.id"), index=True)
+    post_id: Mapped[int] = mapped_column(ForeignKey("creator_posts.id"))
     views: Mapped[int] = mapped_column(Integer, default=0)
     likes: Mapped[int] = mapped_column(Integer, default=0)
     comments: Mapped[int] = mapped_column(Integer, default=0)
@@ -113,9 +142,19 @@ class PostSnapshot(Base):
 class VelocityAlert(Base):
     """The core output: a push-ready alert when a trend spike is detected."""
     __tablename__ = "velocity_alerts"
+    __table_args__ = (
+        # Cooldown lookups: (user_id, post_id) alerted since a cutoff
+        Index("ix_velocity_alerts_user_post_created", "user_id", "post_id", "created_at"),
+        # Push queue: PENDING alerts due for a push (queued ones only)
+        Index("ix_velocity_alerts_status_next_push", "status", "next_push_at"),
+        # Alert feed: a user's alerts newest first, keyset-paginated on (created_at, id)
+        Index("ix_velocity_alerts_user_created", "user_id", "created_at", "id"),
+        # Pending / per-status counts for a user
+        Index("ix_velocity_alerts_user_status", "user_id", "status"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     post_id: Mapped[int] = mapped_column(ForeignKey("creator_posts.id"))
     creator_handle: Mapped[str] = mapped_column(String(255))
 
@@ -129,7 +168,7 @@ class VelocityAlert(Base):
     alert_headline: Mapped[str] = mapped_column(Text)
     alert_body: Mapped[str] = mapped_column(Text)
     draft_hook: Mapped[str | None] = mapped_column(Text)
-    draft_structure: Mapped[dict | None] = mapped_column(JSON)
+    draft_structure: Mapped[dict | None] = mapped_column(JSONType)
     rewrite_rationale: Mapped[str | None] = mapped_column(Text)
 
     urgency: Mapped[str] = mapped_column(SAEnum(AlertUrgency), default=AlertUrgency.MEDIUM)
@@ -142,5 +181,35 @@ class VelocityAlert(Base):
     sent_at: Mapped[datetime | None] = mapped_column(DateTime)
     opened_at: Mapped[datetime | None] = mapped_column(DateTime)
 
+    # Push delivery bookkeeping (see services/push_queue.py); next_push_at
+    # is NULL for alerts that are not queued for a push
+    push_attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_push_at: Mapped[datetime | None] = mapped_column(DateTime)
+    push_error: Mapped[str | None] = mapped_column(Text)
+
     user: Mapped["User"] = relationship(back_populates="alerts")
     source_post: Mapped["CreatorPost"] = relationship()
+
+
+class VelocityFeed(Base):
+    """A user's ranked velocity feed, materialized after every scan."""
+    __tablename__ = "velocity_feeds"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    # Top `velocity_feed_size` posts as VelocityFeedItem dicts, highest multiplier first
+    items: Mapped[list] = mapped_column(JSONType, default=list)
+    spike_count: Mapped[int] = mapped_column(Integer, default=0)
+    last_scan_at: Mapped[datetime | None] = mapped_column(DateTime)
+    refreshed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class AlertStatusCount(Base):
+    """
+    Per-user alert count for one status, kept in step with every status
+    change (see services/alert_counts.py) so feed totals are a tiny read.
+    """
+    __tablename__ = "alert_status_counts"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    status: Mapped[str] = mapped_column(SAEnum(AlertStatus), primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0)
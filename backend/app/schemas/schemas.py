@@ -41,6 +41,8 @@ class TrackedCreatorResponse(BaseModel):
     avg_views: float | None
     avg_likes: float | None
     avg_comments: float | None
+    median_views: float | None = None
+    mad_views: float | None = None
     last_scraped_at: datetime | None
     is_active: bool
 
@@ -86,6 +88,10 @@ class AlertFeedResponse(BaseModel):
     alerts: list[AlertResponse]
     total: int
     pending_count: int
+    # Alert count per status (all of the user's alerts, not just this page)
+    status_counts: dict[str, int]
+    # Pass as `cursor` to fetch the next page; None on the last page
+    next_cursor: str | None = None
 
 
 class VelocityFeedItem(BaseModel):
@@ -111,8 +117,17 @@ class TriggerScanRequest(BaseModel):
     user_id: int
 
 
-class TriggerScanResponse(BaseModel):
+class ScanJobResponse(BaseModel):
+    job_id: str
+    status: str
+    stage: str
+    creators_total: int
+    creators_done: int
     posts_scanned: int
     spikes_detected: int
     alerts_generated: int
-    alerts: list[AlertResponse]
+    alert_ids: list[int]
+    error: str | None
+    created_at: datetime
+    started_at: datetime | None
+    finished_at: datetime | None
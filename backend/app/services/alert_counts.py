@@ -0,0 +1,147 @@
+"""
+Per-user alert counters.
+
+The alert feed reports a total and a count per status. Counting the user's
+alerts on every request grows with their history, so instead
+`alert_status_counts` holds one row per (user, status), and every write that
+creates an alert or changes its status adjusts it in the same transaction:
+
+- `count_new_alerts`: alerts inserted as PENDING
+- `move_alert_status`: a conditional `UPDATE ... WHERE status = <from>
+  RETURNING user_id`, so only rows that really changed are counted, even
+  when the push queue and the API race on the same alert
+- `set_alert_status`: the same for one loaded alert, whatever its status
+
+Counter rows are upserted with `count = count + delta`, so concurrent writers
+never lose increments. Every adjustment also marks the users' cached reads
+stale once the transaction commits (see response_cache.py).
+"""
+import logging
+from collections import Counter
+
+from sqlalchemy import select, update, and_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.database import chunked
+from app.models.models import VelocityAlert, AlertStatus, AlertStatusCount
+from app.services.response_cache import mark_changed
+
+logger = logging.getLogger(__name__)
+
+# Dialects with a native INSERT ... ON CONFLICT to add deltas in one statement
+_UPSERT_INSERTS = {
+    "sqlite": sqlite_insert,
+    "postgresql": postgresql_insert,
+}
+
+
+async def adjust_counts(db: AsyncSession, deltas: Counter):
+    """Add `deltas` ({(user_id, status): n}) to the counters. The caller commits."""
+    rows = [
+        {"user_id": user_id, "status": status, "count": delta}
+        for (user_id, status), delta in deltas.items()
+        if delta
+    ]
+    if not rows:
+        return
+    mark_changed(db, {row["user_id"] for row in rows})
+
+    dialect_insert = _UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if dialect_insert is not None:
+        stmt = dialect_insert(AlertStatusCount).values(rows)
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[AlertStatusCount.user_id, AlertStatusCount.status],
+                set_={"count": AlertStatusCount.count + stmt.excluded.count},
+            )
+        )
+        return
+
+    # Portable path: bump the rows that exist, insert the rest
+    for row in rows:
+        result = await db.execute(
+            update(AlertStatusCount)
+            .where(
+                and_(
+                    AlertStatusCount.user_id == row["user_id"],
+                    AlertStatusCount.status == row["status"],
+                )
+            )
+            .values(count=AlertStatusCount.count + row["count"])
+        )
+        if result.rowcount == 0:
+            db.add(AlertStatusCount(**row))
+    await db.flush()
+
+
+async def count_new_alerts(db: AsyncSession, alerts: list[VelocityAlert]):
+    """Count freshly inserted alerts under their initial status."""
+    await adjust_counts(db, Counter((alert.user_id, alert.status) for alert in alerts))
+
+
+async def move_alert_status(
+    db: AsyncSession,
+    alert_ids: list[int],
+    from_status: AlertStatus,
+    to_status: AlertStatus,
+    **values,
+) -> list[int]:
+    """
+    Move the alerts still in `from_status` to `to_status` (setting `values`
+    too) and update the counters. Returns the ids that actually moved.
+    """
+    moved_ids, deltas = [], Counter()
+    for chunk in chunked(alert_ids):
+        result = await db.execute(
+            update(VelocityAlert)
+            .where(
+                and_(
+                    VelocityAlert.id.in_(chunk),
+                    VelocityAlert.status == from_status,
+                )
+            )
+            .values(status=to_status, **values)
+            .returning(VelocityAlert.id, VelocityAlert.user_id),
+            execution_options={"synchronize_session": False},
+        )
+        for alert_id, user_id in result.all():
+            moved_ids.append(alert_id)
+            deltas[(user_id, from_status)] -= 1
+            deltas[(user_id, to_status)] += 1
+    await adjust_counts(db, deltas)
+    return moved_ids
+
+
+async def set_alert_status(
+    db: AsyncSession, alert: VelocityAlert, status: AlertStatus, **values
+) -> bool:
+    """
+    Move one loaded alert to `status` from whatever status it is in now.
+    If another writer changed it since it was loaded, re-read and retry.
+    """
+    for _ in range(3):
+        if alert.status == status:
+            return False
+        if await move_alert_status(db, [alert.id], alert.status, status, **values):
+            set_committed_value(alert, "status", status)
+            for key, value in values.items():
+                set_committed_value(alert, key, value)
+            return True
+        await db.refresh(alert, ["status"])
+    logger.warning(f"Alert {alert.id} kept changing status; gave up moving it to {status}")
+    return False
+
+
+async def load_status_counts(db: AsyncSession, user_id: int) -> dict[str, int]:
+    """Alert count per status for a user, zeros included."""
+    counts = {status.value: 0 for status in AlertStatus}
+    result = await db.execute(
+        select(AlertStatusCount.status, AlertStatusCount.count)
+        .where(AlertStatusCount.user_id == user_id)
+    )
+    for status, count in result.all():
+        counts[AlertStatus(status).value] = count
+    return counts
@@ -4,13 +4,24 @@ Content rewriter service.
 When a velocity spike is detected, this service takes the trending post's
 format/structure and rewrites it through the lens of the user's content pillars.
 The output is a ready-to-film draft, not a suggestion.
+
+All requests share one pooled OpenAI client, at most `draft_max_concurrency`
+are in flight at once, each bounded by `draft_request_timeout_seconds` from
+when it gets its slot (so queueing behind other drafts never times it out),
+and drafts are cached by (post, format, hook type,
+the user's handle and pillars) so a viral post rewritten for the same voice
+is generated once, even when many alerts ask for it concurrently. Point `openai_base_url` at
+any OpenAI-compatible server (e.g. a local fake) to exercise this offline.
 """
+import asyncio
+import hashlib
 import logging
 import json
 from dataclasses import dataclass
 
 from openai import AsyncOpenAI
 
+from app.core.cache import TTLCache
 from app.core.config import settings
 from app.models.models import CreatorPost, User
 
@@ -47,11 +58,91 @@ Rules:
 - The tone must match what the user's audience expects
 - Be urgent but not desperate"""
 
+_client: AsyncOpenAI | None = None
+_request_slots = asyncio.Semaphore(max(settings.draft_max_concurrency, 1))
+
+
+def _get_client() -> AsyncOpenAI:
+    """One client for the process so requests share its HTTP connection pool."""
+    global _client
+    if _client is None:
+        _client = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url or None,
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+class DraftCache(TTLCache[DraftContent]):
+    """LRU + TTL cache of generated drafts, with in-flight request sharing."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        super().__init__(max_entries, ttl_seconds)
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    async def get_or_create(self, key: str, factory) -> DraftContent | None:
+        """
+        Return the cached draft, join an identical in-flight request, or run
+        `factory()` once. A None result (failed request) is not cached.
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            # Joining a request already made counts as a hit
+            self.hits += 1
+        else:
+            cached = self.get(key)
+            if cached is not None:
+                return cached
+            task = asyncio.ensure_future(self._fill(key, factory))
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _fill(self, key: str, factory) -> DraftContent | None:
+        try:
+            draft = await factory()
+            if draft is not None:
+                self.put(key, draft)
+            return draft
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict[str, float]:
+        return {**super().stats(), "in_flight": len(self._inflight)}
+
+
+draft_cache = DraftCache(
+    max_entries=settings.draft_cache_max_entries,
+    ttl_seconds=settings.draft_cache_ttl_minutes * 60,
+)
+
+
+def draft_cache_key(post: CreatorPost, user: User) -> str:
+    # Everything user-specific in the prompt: the handle and the pillars
+    voice_hash = hashlib.sha256(
+        json.dumps(
+            [user.instagram_handle or "", user.content_pillars or {}], sort_keys=True
+        ).encode()
+    ).hexdigest()[:16]
+    return (
+        f"{post.id}:{post.detected_format or ''}:"
+        f"{post.detected_hook_type or ''}:{voice_hash}"
+    )
+
 
 async def generate_draft(
     user: User, spike_post: CreatorPost, velocity_multiplier: float
 ) -> DraftContent:
     """Generate a rewritten draft based on a trending post and user's pillars."""
+    if not settings.openai_api_key or settings.openai_api_key.startswith("sk-your"):
+        return _generate_fallback_draft(user, spike_post, velocity_multiplier)
+
     pillars = user.content_pillars or {}
     primary_narrative = pillars.get("primary_narrative", "their content journey")
     topics = pillars.get("topics", [])
@@ -75,21 +166,31 @@ USER'S CONTENT PILLARS:
 
 Generate a complete draft that rides this exact algorithmic wave using the user's unique positioning."""
 
-    if not settings.openai_api_key or settings.openai_api_key.startswith("sk-your"):
+    draft = await draft_cache.get_or_create(
+        draft_cache_key(spike_post, user),
+        lambda: _request_draft(user_prompt),
+    )
+    if draft is None:
         return _generate_fallback_draft(user, spike_post, velocity_multiplier)
+    return draft
+
 
+async def _request_draft(user_prompt: str) -> DraftContent | None:
     try:
-        client = AsyncOpenAI(api_key=settings.openai_api_key)
-        response = await client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": REWRITE_SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt},
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.8,
-            max_tokens=1000,
-        )
+        async with _request_slots:
+            response = await asyncio.wait_for(
+                _get_client().chat.completions.create(
+                    model=settings.openai_model,
+                    messages=[
+                        {"role": "system", "content": REWRITE_SYSTEM_PROMPT},
+                        {"role": "user", "content": user_prompt},
+                    ],
+                    response_format={"type": "json_object"},
+                    temperature=0.8,
+                    max_tokens=1000,
+                ),
+                timeout=settings.draft_request_timeout_seconds,
+            )
         result = json.loads(response.choices[0].message.content)
         return DraftContent(
             hook=result.get("hook", ""),
@@ -103,9 +204,54 @@ Generate a complete draft that rides this exact algorithmic wave using the user'
             rationale=result.get("format_breakdown", ""),
             estimated_production_time=result.get("estimated_production_time", "unknown"),
         )
+    except asyncio.TimeoutError:
+        logger.error(
+            f"OpenAI rewrite timed out after {settings.draft_request_timeout_seconds}s"
+        )
+        return None
     except Exception as e:
         logger.error(f"OpenAI rewrite failed: {e}")
-        return _generate_fallback_draft(user, spike_post, velocity_multiplier)
+        return None
+
+
+# Fallback templates, bound once at import and rendered with format_map.
+# Fields: narrative, topic, topic_industry, fmt, hook_type, hook (the hook
+# type without its "hook_" prefix), multiplier.
+FALLBACK_HOOK_TEMPLATES = {
+    "hook_question": "What nobody tells you about {topic}...",
+    "hook_cliffhanger": "I almost gave up on {narrative}. Then this happened.",
+    "hook_controversial": "Unpopular opinion about {topic_industry}:",
+    "hook_promise": "Here's exactly how I handle {topic} (step by step)",
+    "hook_relatable": "POV: You're trying to balance {narrative} and nobody gets it",
+    "hook_versus": "The difference between people who succeed at {topic} and those who don't",
+}
+FALLBACK_BEAT_TEMPLATES = (
+    "Beat 1: Open with {hook} — straight to camera",
+    "Beat 2: The problem/tension — connect to {narrative}",
+    "Beat 3: The insight/turn — your unique angle on {topic}",
+    "Beat 4: Proof/example from your experience",
+    "Beat 5: CTA — drive to comments or saves",
+)
+FALLBACK_FORMAT_BREAKDOWN = (
+    "This {fmt} format hit {multiplier:.1f}x because the "
+    "'{hook}' opening pattern triggers "
+    "the algorithm's early retention signal."
+)
+FALLBACK_ADAPTATION_NOTES = "Adapted from {fmt} format to fit your narrative: {narrative}"
+FALLBACK_RATIONALE = (
+    "The original post used a '{fmt}' format with a "
+    "'{hook}' hook pattern, which hit "
+    "{multiplier:.1f}x the creator's average. This format works because "
+    "it front-loads curiosity, which boosts early retention — the #1 signal "
+    "Instagram's algorithm uses to push reels."
+)
+FALLBACK_CTA = "Save this for later and drop a comment with your experience"
+
+_hook_formatters = {k: v.format_map for k, v in FALLBACK_HOOK_TEMPLATES.items()}
+_beat_formatters = tuple(t.format_map for t in FALLBACK_BEAT_TEMPLATES)
+_format_breakdown = FALLBACK_FORMAT_BREAKDOWN.format_map
+_adaptation_notes = FALLBACK_ADAPTATION_NOTES.format_map
+_rationale = FALLBACK_RATIONALE.format_map
 
 
 def _generate_fallback_draft(
@@ -113,46 +259,28 @@ def _generate_fallback_draft(
 ) -> DraftContent:
     """Template-based draft when OpenAI is unavailable."""
     pillars = user.content_pillars or {}
-    narrative = pillars.get("primary_narrative", "your journey")
     topics = pillars.get("topics", ["content creation"])
-    fmt = post.detected_format or "reel"
     hook_type = post.detected_hook_type or "hook_question"
-
-    hook_templates = {
-        "hook_question": f"What nobody tells you about {topics[0] if topics else 'this'}...",
-        "hook_cliffhanger": f"I almost gave up on {narrative}. Then this happened.",
-        "hook_controversial": f"Unpopular opinion about {topics[0] if topics else 'this industry'}:",
-        "hook_promise": f"Here's exactly how I handle {topics[0] if topics else 'this'} (step by step)",
-        "hook_relatable": f"POV: You're trying to balance {narrative} and nobody gets it",
-        "hook_versus": f"The difference between people who succeed at {topics[0] if topics else 'this'} and those who don't",
+    fields = {
+        "narrative": pillars.get("primary_narrative", "your journey"),
+        "topic": topics[0] if topics else "this",
+        "topic_industry": topics[0] if topics else "this industry",
+        "fmt": post.detected_format or "reel",
+        "hook_type": hook_type,
+        "hook": hook_type.replace("hook_", ""),
+        "multiplier": multiplier,
     }
 
-    hook = hook_templates.get(hook_type, hook_templates["hook_question"])
+    hook = _hook_formatters.get(hook_type, _hook_formatters["hook_question"])
 
     return DraftContent(
-        hook=hook,
+        hook=hook(fields),
         structure={
-            "visual_beats": [
-                f"Beat 1: Open with {hook_type.replace('hook_', '')} — straight to camera",
-                f"Beat 2: The problem/tension — connect to {narrative}",
-                f"Beat 3: The insight/turn — your unique angle on {topics[0] if topics else 'this'}",
-                f"Beat 4: Proof/example from your experience",
-                f"Beat 5: CTA — drive to comments or saves",
-            ],
-            "format_breakdown": (
-                f"This {fmt} format hit {multiplier:.1f}x because the "
-                f"'{hook_type.replace('hook_', '')}' opening pattern triggers "
-                f"the algorithm's early retention signal."
-            ),
-            "adaptation_notes": f"Adapted from {fmt} format to fit your narrative: {narrative}",
-            "cta": "Save this for later and drop a comment with your experience",
+            "visual_beats": [beat(fields) for beat in _beat_formatters],
+            "format_breakdown": _format_breakdown(fields),
+            "adaptation_notes": _adaptation_notes(fields),
+            "cta": FALLBACK_CTA,
         },
-        rationale=(
-            f"The original post used a '{fmt}' format with a "
-            f"'{hook_type.replace('hook_', '')}' hook pattern, which hit "
-            f"{multiplier:.1f}x the creator's average. This format works because "
-            f"it front-loads curiosity, which boosts early retention — the #1 signal "
-            f"Instagram's algorithm uses to push reels."
-        ),
+        rationale=_rationale(fields),
         estimated_production_time="30-45 min",
     )
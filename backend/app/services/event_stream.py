@@ -0,0 +1,182 @@
+"""
+In-process pub/sub for the live dashboard stream.
+
+`GET /users/{id}/stream` (Server-Sent Events) subscribes here, and alert
+creation and the scanner publish to it, so a tab learns about a wave the
+moment it is detected instead of on its next poll:
+
+- fan-out is per user: an event only reaches that user's open connections
+- backpressure: each connection has a bounded queue; a client that falls
+  `stream_queue_size` events behind is disconnected rather than buffered
+  without limit, and its browser reconnects and resumes
+- resume: every event gets an increasing id and the last
+  `stream_replay_events` per user are kept, so a reconnect with
+  `Last-Event-ID` replays what it missed; if that is no longer in the
+  buffer the client gets a `resync` event and should refetch
+
+The broker lives in this process, so it serves one API worker.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Any
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StreamEvent:
+    id: int
+    type: str
+    data: dict[str, Any]
+
+    def encode(self) -> str:
+        payload = json.dumps(self.data, default=str)
+        return f"id: {self.id}\nevent: {self.type}\ndata: {payload}\n\n"
+
+
+@dataclass(eq=False)
+class Subscription:
+    user_id: int
+    # StreamEvents, or None once the subscription is closed
+    queue: asyncio.Queue
+    # Set when the client fell too far behind; the stream then ends
+    overflowed: bool = False
+    closed: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+@dataclass
+class BrokerStats:
+    published: int = 0
+    delivered: int = 0
+    replayed: int = 0
+    slow_disconnects: int = 0
+
+
+class EventBroker:
+
+    def __init__(self, replay_events: int, queue_size: int):
+        self.replay_events = replay_events
+        self.queue_size = max(queue_size, 1)
+        # Millisecond clock seed keeps ids increasing across restarts
+        seed = int(time.time() * 1000)
+        self._ids = itertools.count(seed)
+        self._last_id = seed - 1
+        self._history: dict[int, deque[StreamEvent]] = defaultdict(
+            lambda: deque(maxlen=self.replay_events)
+        )
+        # Newest event id per user that has already fallen out of the buffer
+        self._evicted_upto: dict[int, int] = {}
+        self._subscribers: dict[int, set[Subscription]] = defaultdict(set)
+        self.stats_counters = BrokerStats()
+
+    def publish(self, user_id: int, event_type: str, data: dict[str, Any]) -> StreamEvent:
+        """Record an event for `user_id` and hand it to their open streams."""
+        event = StreamEvent(id=next(self._ids), type=event_type, data=data)
+        self._last_id = event.id
+        history = self._history[user_id]
+        if len(history) == history.maxlen:
+            self._evicted_upto[user_id] = history[0].id
+        history.append(event)
+        self.stats_counters.published += 1
+        for subscription in list(self._subscribers.get(user_id, ())):
+            self._offer(subscription, event)
+        return event
+
+    def _offer(self, subscription: Subscription, event: StreamEvent):
+        try:
+            subscription.queue.put_nowait(event)
+            self.stats_counters.delivered += 1
+        except asyncio.QueueFull:
+            subscription.overflowed = True
+            self.stats_counters.slow_disconnects += 1
+            logger.warning(
+                f"Stream for user {subscription.user_id} fell "
+                f"{self.queue_size} events behind; disconnecting"
+            )
+            self.unsubscribe(subscription)
+
+    def subscribe(self, user_id: int, last_event_id: int | None = None) -> Subscription:
+        """
+        Open a stream for `user_id`. With `last_event_id`, the buffered
+        events after it are queued first (or a `resync` if they are gone).
+        """
+        subscription = Subscription(
+            user_id=user_id, queue=asyncio.Queue(maxsize=self.queue_size)
+        )
+        if last_event_id is not None:
+            for event in self._missed(user_id, last_event_id)[-self.queue_size:]:
+                subscription.queue.put_nowait(event)
+                self.stats_counters.replayed += 1
+        self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def _missed(self, user_id: int, last_event_id: int) -> list[StreamEvent]:
+        # Events after last_event_id were evicted, or the id is from another run
+        if (
+            last_event_id < self._evicted_upto.get(user_id, 0)
+            or last_event_id > self._last_id
+        ):
+            return [StreamEvent(id=self._last_id, type="resync", data={})]
+        history = self._history.get(user_id, ())
+        return [event for event in history if event.id > last_event_id]
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.user_id]
+        if not subscription.closed.is_set():
+            subscription.closed.set()
+            # Wake a reader blocked on an empty queue (a full one wakes anyway)
+            try:
+                subscription.queue.put_nowait(None)
+            except asyncio.QueueFull:
+                pass
+
+    async def stream(self, subscription: Subscription, heartbeat_seconds: float):
+        """Yield SSE frames for `subscription` until it is closed."""
+        try:
+            yield "retry: 3000\n\n"
+            while not subscription.closed.is_set():
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.queue.get(), timeout=heartbeat_seconds
+                    )
+                except asyncio.TimeoutError:
+                    # Comment frame keeps proxies from timing the connection out
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    break
+                yield event.encode()
+        finally:
+            self.unsubscribe(subscription)
+
+    def close_all(self):
+        for subscribers in list(self._subscribers.values()):
+            for subscription in list(subscribers):
+                self.unsubscribe(subscription)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "connections": sum(len(s) for s in self._subscribers.values()),
+            "users": len(self._subscribers),
+            "published": self.stats_counters.published,
+            "delivered": self.stats_counters.delivered,
+            "replayed": self.stats_counters.replayed,
+            "slow_disconnects": self.stats_counters.slow_disconnects,
+        }
+
+
+event_broker = EventBroker(
+    replay_events=settings.stream_replay_events,
+    queue_size=settings.stream_queue_size,
+)
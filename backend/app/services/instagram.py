@@ -1,30 +1,89 @@
 """
 Instagram data ingestion layer.
 
-Fetches competitor posts and engagement metrics using instaloader.
+Fetches competitor posts and engagement metrics using instaloader. All
+instaloader calls are blocking and run on the scrape executor's thread pool.
 Falls back to a mock data provider for development/demo without credentials.
+
+Scans fetch incrementally: paging stops at the first (non-pinned) post older
+than the velocity analysis window, since nothing older is scored. A full
+`baseline_post_count` fetch still runs every `baseline_refresh_hours` to keep
+the baseline window's engagement fresh. `last_seen_post_at` records each
+creator's high-water mark.
+
+Live calls go through the shared rate limiter (rate_limit.py): a token
+bucket, exponential backoff on HTTP 429 and a circuit breaker. Throttling
+surfaces as ScraperThrottled rather than being papered over with mock data.
+
+The scraper is a process-wide singleton (`get_scraper`). Instaloader's
+context (HTTP session, cookies, rate controller) is not thread-safe, so each
+scrape executor thread gets its own loader, loading the session file once per
+thread, and its own cache of resolved `Profile` objects (a Profile is bound to
+the context that resolved it). A cached Profile keeps the full metadata its
+first post listing loaded, so fetching a creator's profile and then its posts
+costs one profile lookup rather than two. Profile metadata is also cached
+process-wide, for longer.
 """
+import asyncio
 import logging
+import threading
 from datetime import datetime, timedelta
 from typing import Any
 
 import instaloader
-from sqlalchemy import select, func
+import numpy as np
+from sqlalchemy import select, update, insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
+from app.core.cache import TTLCache
+from app.core.database import bulk_insert
 from app.models.models import TrackedCreator, CreatorPost, PostSnapshot
+from app.services.scrape_executor import scrape_executor, ScrapeCancelled
+from app.services.rate_limit import (
+    ScraperThrottled, ScraperCircuitOpen, scrape_bucket, scrape_breaker,
+    backoff_delay,
+)
+from app.services.velocity import ANALYSIS_WINDOW_HOURS
 
 logger = logging.getLogger(__name__)
 
+class _RaisingRateController(instaloader.RateController):
+    """
+    instaloader sleeps (often for minutes) inside a worker thread on a 429;
+    raise instead so our backoff and circuit breaker handle it.
+    """
+
+    def handle_429(self, query_type: str) -> None:
+        raise instaloader.TooManyRequestsException(f"429 Too Many Requests ({query_type})")
+
+
+def _is_throttle(error: BaseException) -> bool:
+    # instaloader wraps the final attempt's 429 in a ConnectionException
+    return isinstance(error, instaloader.TooManyRequestsException) or isinstance(
+        error.__cause__, instaloader.TooManyRequestsException
+    )
+
 
 class InstagramScraper:
     def __init__(self):
-        self._loader: instaloader.Instaloader | None = None
+        # One Instaloader and Profile cache per scrape executor thread
+        self._local = threading.local()
+        # Every thread's Profile cache, for stats
+        self._profile_caches: list[TTLCache[instaloader.Profile]] = []
+        self._profile_caches_lock = threading.Lock()
+        self._metadata: TTLCache[dict[str, Any]] = TTLCache(
+            max_entries=settings.scraper_profile_cache_max_entries,
+            ttl_seconds=settings.scraper_metadata_cache_ttl_minutes * 60,
+        )
 
     def _get_loader(self) -> instaloader.Instaloader:
-        if self._loader is None:
-            self._loader = instaloader.Instaloader(
+        # Called from scrape executor threads; build each thread's loader once
+        loader = getattr(self._local, "loader", None)
+        if loader is None:
+            loader = instaloader.Instaloader(
                 download_pictures=False,
                 download_videos=False,
                 download_video_thumbnails=False,
@@ -32,56 +91,163 @@ class InstagramScraper:
                 download_comments=False,
                 save_metadata=False,
                 compress_json=False,
+                rate_controller=_RaisingRateController,
             )
             if settings.instagram_session_id:
                 try:
-                    self._loader.load_session_from_file(
-                        "stan_bot", settings.instagram_session_id
-                    )
+                    loader.load_session_from_file("stan_bot", settings.instagram_session_id)
                 except Exception:
                     logger.warning("Could not load Instagram session, running without auth")
-        return self._loader
+            self._local.loader = loader
+        return loader
+
+    def _thread_profiles(self) -> TTLCache[instaloader.Profile]:
+        # Called from scrape executor threads, like _get_loader
+        profiles = getattr(self._local, "profiles", None)
+        if profiles is None:
+            profiles = TTLCache(
+                max_entries=settings.scraper_profile_cache_max_entries,
+                ttl_seconds=settings.scraper_profile_cache_ttl_minutes * 60,
+            )
+            with self._profile_caches_lock:
+                self._profile_caches.append(profiles)
+            self._local.profiles = profiles
+        return profiles
 
     async def fetch_creator_profile(self, handle: str) -> dict[str, Any]:
         """Fetch basic profile info for a creator."""
+        cached = self._metadata.get(handle)
+        if cached is not None:
+            return dict(cached)
         try:
-            loader = self._get_loader()
-            profile = instaloader.Profile.from_username(loader.context, handle)
-            return {
-                "handle": handle,
-                "display_name": profile.full_name,
-                "follower_count": profile.followers,
-                "following_count": profile.followees,
-                "post_count": profile.mediacount,
-                "biography": profile.biography,
-            }
+            return await self._call(self._fetch_creator_profile_sync, handle)
+        except ScraperThrottled:
+            raise
         except Exception as e:
             logger.error(f"Failed to fetch profile for {handle}: {e}")
             return {"handle": handle, "error": str(e)}
 
     async def fetch_recent_posts(
-        self, handle: str, max_posts: int = 20
+        self, handle: str, max_posts: int = 20, since: datetime | None = None
     ) -> list[dict[str, Any]]:
-        """Fetch recent posts with engagement metrics."""
-        posts = []
+        """
+        Fetch recent posts with engagement metrics, newest first. With
+        `since`, stop paging at the first post published before it.
+        Errors propagate so the caller can tell "no new posts" from failure.
+        """
         try:
-            loader = self._get_loader()
-            profile = instaloader.Profile.from_username(loader.context, handle)
-            for i, post in enumerate(profile.get_posts()):
-                if i >= max_posts:
-                    break
-                posts.append({
-                    "post_id": post.shortcode,
-                    "post_url": f"https://instagram.com/p/{post.shortcode}/",
-                    "caption": post.caption or "",
-                    "post_type": self._detect_post_type(post),
-                    "posted_at": post.date_utc,
-                    "views": post.video_view_count or 0,
-                    "likes": post.likes,
-                    "comments": post.comments,
-                })
+            return await self._call(self._fetch_recent_posts_sync, handle, max_posts, since)
+        except ScraperThrottled:
+            raise
         except Exception as e:
             logger.error(f"Failed to fetch posts for {handle}: {e}")
+            raise
+
+    async def _call(self, fn, *args):
+        """Run a blocking fetch under the shared rate limit, retrying 429s."""
+        for attempt in range(settings.scraper_max_retries + 1):
+            # In half-open, the call admitted by allow() is the single probe
+            is_probe = scrape_breaker.state == "half_open"
+            if not scrape_breaker.allow():
+                raise ScraperCircuitOpen(
+                    "scraper circuit open", scrape_breaker.retry_after()
+                )
+            try:
+                await scrape_bucket.acquire()
+                result = await scrape_executor.run(fn, *args)
+            except Exception as e:
+                if not _is_throttle(e):
+                    raise
+                scrape_breaker.record_failure()
+                if attempt == settings.scraper_max_retries:
+                    raise ScraperThrottled(str(e), scrape_breaker.retry_after()) from e
+                delay = backoff_delay(attempt)
+                logger.warning(f"Instagram throttled {fn.__name__}{args}, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            else:
+                scrape_breaker.record_success()
+                return result
+            finally:
+                # No verdict (other error, cancelled): free the probe slot
+                if is_probe:
+                    scrape_breaker.abandon_probe()
+
+    def stats(self) -> dict[str, dict]:
+        return {
+            "profile_cache": self._profile_cache_stats(),
+            "metadata_cache": self._metadata.stats(),
+            "rate_limit": scrape_bucket.stats(),
+            "circuit_breaker": scrape_breaker.stats(),
+        }
+
+    def _profile_cache_stats(self) -> dict[str, float]:
+        with self._profile_caches_lock:
+            caches = list(self._profile_caches)
+        totals = {"threads": len(caches), "entries": 0, "hits": 0, "misses": 0}
+        for cache in caches:
+            stats = cache.stats()
+            for key in ("entries", "hits", "misses"):
+                totals[key] += stats[key]
+        lookups = totals["hits"] + totals["misses"]
+        totals["hit_rate"] = round(totals["hits"] / lookups, 3) if lookups else 0.0
+        return totals
+
+    # Blocking instaloader calls below run on the scrape executor's threads
+
+    def _get_profile(self, handle: str) -> instaloader.Profile:
+        profiles = self._thread_profiles()
+        profile = profiles.get(handle)
+        if profile is None:
+            profile = instaloader.Profile.from_username(self._get_loader().context, handle)
+            profiles.put(handle, profile)
+            self._metadata.put(handle, self._profile_metadata(handle, profile))
+        return profile
+
+    def _profile_metadata(self, handle: str, profile: instaloader.Profile) -> dict[str, Any]:
+        return {
+            "handle": handle,
+            "display_name": profile.full_name,
+            "follower_count": profile.followers,
+            "following_count": profile.followees,
+            "post_count": profile.mediacount,
+            "biography": profile.biography,
+        }
+
+    def _fetch_creator_profile_sync(
+        self, handle: str, cancel_event: threading.Event
+    ) -> dict[str, Any]:
+        return self._profile_metadata(handle, self._get_profile(handle))
+
+    def _fetch_recent_posts_sync(
+        self,
+        handle: str,
+        max_posts: int,
+        since: datetime | None,
+        cancel_event: threading.Event,
+    ) -> list[dict[str, Any]]:
+        profile = self._get_profile(handle)
+        posts = []
+        for post in profile.get_posts():
+            if len(posts) >= max_posts:
+                break
+            if cancel_event.is_set():
+                raise ScrapeCancelled(f"post fetch for {handle} cancelled")
+            if since is not None and post.date_utc < since:
+                # Pinned posts sit above the feed out of date order
+                if post.is_pinned:
+                    continue
+                break
+            posts.append({
+                "post_id": post.shortcode,
+                "post_url": f"https://instagram.com/p/{post.shortcode}/",
+                "caption": post.caption or "",
+                "post_type": self._detect_post_type(post),
+                "posted_at": post.date_utc,
+                "views": post.video_view_count or 0,
+                "likes": post.likes,
+                "comments": post.comments,
+            })
         return posts
 
     def _detect_post_type(self, post) -> str:
@@ -129,7 +295,7 @@ class MockInstagramScraper:
         }
 
     async def fetch_recent_posts(
-        self, handle: str, max_posts: int = 20
+        self, handle: str, max_posts: int = 20, since: datetime | None = None
     ) -> list[dict[str, Any]]:
         import random
         mock = self._mock_creators.get(handle, {"avg_views": 12000})
@@ -163,6 +329,8 @@ class MockInstagramScraper:
                 "detected_format": fmt[0],
                 "detected_hook_type": fmt[1],
             })
+        if since is not None:
+            posts = [p for p in posts if p["posted_at"] >= since]
         return sorted(posts, key=lambda p: p["posted_at"], reverse=True)
 
     def _generate_mock_caption(self, handle: str, fmt: str) -> str:
@@ -178,7 +346,7 @@ class MockInstagramScraper:
 
 
 class FallbackScraper:
-    """Tries live Instagram first, falls back to mock on any failure."""
+    """Tries live Instagram first, falls back to mock on failure (not throttling)."""
 
     def __init__(self):
         self._live = InstagramScraper()
@@ -189,97 +357,269 @@ class FallbackScraper:
             result = await self._live.fetch_creator_profile(handle)
             if "error" not in result:
                 return result
+        except ScraperThrottled:
+            raise
         except Exception:
             pass
         logger.info(f"Live profile fetch failed for {handle}, using mock data")
         return await self._mock.fetch_creator_profile(handle)
 
     async def fetch_recent_posts(
-        self, handle: str, max_posts: int = 20
+        self, handle: str, max_posts: int = 20, since: datetime | None = None
     ) -> list[dict[str, Any]]:
         try:
-            posts = await self._live.fetch_recent_posts(handle, max_posts)
-            if posts:
+            posts = await self._live.fetch_recent_posts(handle, max_posts, since)
+            # An incremental fetch legitimately finds nothing new
+            if posts or since is not None:
                 return posts
+        except ScraperThrottled:
+            # Mock data would hide throttling from the scanner; let it defer
+            raise
         except Exception:
             pass
         logger.info(f"Live post fetch failed for {handle}, using mock data")
-        return await self._mock.fetch_recent_posts(handle, max_posts)
+        return await self._mock.fetch_recent_posts(handle, max_posts, since)
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        return self._live.stats()
+
+
+_scraper: FallbackScraper | MockInstagramScraper | None = None
 
 
 def get_scraper() -> FallbackScraper | MockInstagramScraper:
-    if settings.instagram_session_id:
-        return FallbackScraper()
-    logger.info("No Instagram session configured, using mock scraper for demo")
-    return MockInstagramScraper()
+    """The process-wide scraper, built on first use and then reused."""
+    global _scraper
+    if _scraper is None:
+        if settings.instagram_session_id:
+            _scraper = FallbackScraper()
+        else:
+            logger.info("No Instagram session configured, using mock scraper for demo")
+            _scraper = MockInstagramScraper()
+    return _scraper
+
+
+def scraper_stats() -> dict[str, Any]:
+    if _scraper is None:
+        return {"mode": "not started"}
+    if isinstance(_scraper, MockInstagramScraper):
+        return {"mode": "mock"}
+    return {"mode": "live", **_scraper.stats()}
+
+
+async def get_canonical_creator(
+    db: AsyncSession, handle: str
+) -> TrackedCreator | None:
+    """
+    Posts for a handle are stored once, under the oldest TrackedCreator row
+    for that handle; every other user's row for the handle shares them.
+    """
+    result = await db.execute(
+        select(TrackedCreator)
+        .where(TrackedCreator.instagram_handle == handle)
+        .order_by(TrackedCreator.id)
+        .limit(1)
+    )
+    return result.scalar_one_or_none()
+
+
+def incremental_fetch_cutoff(creator: TrackedCreator, now: datetime) -> datetime | None:
+    """
+    Oldest post date an incremental fetch needs (the start of the velocity
+    analysis window), or None when a full baseline refresh is due.
+    """
+    refreshed = creator.baseline_refreshed_at
+    if refreshed is None or now - refreshed >= timedelta(hours=settings.baseline_refresh_hours):
+        return None
+    return now - timedelta(hours=ANALYSIS_WINDOW_HOURS)
 
 
 async def ingest_creator_posts(
-    db: AsyncSession, creator: TrackedCreator
+    db: AsyncSession,
+    creator: TrackedCreator,
+    raw_posts: list[dict[str, Any]] | None = None,
+    full_refresh: bool = True,
 ) -> list[CreatorPost]:
-    """Fetch and store/update posts for a tracked creator."""
-    scraper = get_scraper()
-    raw_posts = await scraper.fetch_recent_posts(
-        creator.instagram_handle, max_posts=settings.baseline_post_count
+    """
+    Fetch and store/update posts for a tracked creator.
+
+    Pass `raw_posts` to ingest an already-fetched batch (the scanner fetches
+    each handle once per cycle), with `full_refresh=False` if it was an
+    incremental fetch. Posts are stored under the canonical row for the
+    handle and the refreshed averages are copied to every row tracking it.
+    """
+    if raw_posts is None:
+        scraper = get_scraper()
+        raw_posts = await scraper.fetch_recent_posts(
+            creator.instagram_handle, max_posts=settings.baseline_post_count
+        )
+        full_refresh = True
+
+    owner = await get_canonical_creator(db, creator.instagram_handle) or creator
+
+    posts = await _upsert_posts(db, owner, raw_posts)
+    snapshot_rows = [
+        {
+            "post_id": post.id,
+            "views": post.views,
+            "likes": post.likes,
+            "comments": post.comments,
+            "captured_at": post.last_updated_at,
+        }
+        for post in posts
+    ]
+    await bulk_insert(db, PostSnapshot, snapshot_rows)
+
+    # Roll the new batch into the creator's bounded baseline window
+    if owner.baseline_window is None:
+        owner.baseline_window = await _seed_baseline_window(db, owner)
+    owner.baseline_window = _merge_baseline_window(owner.baseline_window, posts)
+    baseline = _baseline_stats(owner.baseline_window)
+
+    now = datetime.utcnow()
+    tracking = {"last_scraped_at": now}
+    if full_refresh:
+        tracking["baseline_refreshed_at"] = now
+    newest = max((post.posted_at for post in posts if post.posted_at), default=None)
+    if newest is not None and (
+        owner.last_seen_post_at is None or newest > owner.last_seen_post_at
+    ):
+        tracking["last_seen_post_at"] = newest
+
+    await db.execute(
+        update(TrackedCreator)
+        .where(TrackedCreator.instagram_handle == owner.instagram_handle)
+        .values(**tracking, **baseline)
     )
 
-    ingested = []
+    await db.commit()
+    return posts
+
+
+async def _seed_baseline_window(
+    db: AsyncSession, owner: TrackedCreator
+) -> dict[str, list]:
+    """One-off bounded read for creators ingested before windows existed."""
+    result = await db.scalars(
+        select(CreatorPost)
+        .where(CreatorPost.creator_id == owner.id)
+        .order_by(CreatorPost.posted_at.desc())
+        .limit(settings.baseline_post_count)
+    )
+    return _merge_baseline_window({}, result.all())
+
+
+def _merge_baseline_window(
+    window: dict[str, list], posts: list[CreatorPost]
+) -> dict[str, list]:
+    """
+    Upsert posts into the window and keep only the newest
+    `baseline_post_count` entries. Entries are [posted_at, views, likes, comments].
+    """
+    merged = dict(window)
+    for post in posts:
+        posted_at = post.posted_at.isoformat() if post.posted_at else ""
+        merged[post.instagram_post_id] = [
+            posted_at, post.views or 0, post.likes or 0, post.comments or 0
+        ]
+    newest = sorted(merged.items(), key=lambda item: item[1][0], reverse=True)
+    return dict(newest[:settings.baseline_post_count])
+
+
+def _baseline_stats(window: dict[str, list]) -> dict[str, float]:
+    """Mean engagement plus median/MAD of views over the baseline window."""
+    if not window:
+        return {
+            "avg_views": 0, "avg_likes": 0, "avg_comments": 0,
+            "median_views": None, "mad_views": None,
+        }
+    values = np.array([entry[1:] for entry in window.values()], dtype=float)
+    views = values[:, 0]
+    median = float(np.median(views))
+    return {
+        "avg_views": float(views.mean()),
+        "avg_likes": float(values[:, 1].mean()),
+        "avg_comments": float(values[:, 2].mean()),
+        "median_views": median,
+        "mad_views": float(np.median(np.abs(views - median))),
+    }
+
+
+# Dialects with a native INSERT ... ON CONFLICT that can upsert a whole batch
+_UPSERT_INSERTS = {
+    "sqlite": sqlite_insert,
+    "postgresql": postgresql_insert,
+}
+
+
+async def _upsert_posts(
+    db: AsyncSession, owner: TrackedCreator, raw_posts: list[dict[str, Any]]
+) -> list[CreatorPost]:
+    """
+    Insert new posts and refresh engagement on known ones in one batch.
+
+    New posts are created under `owner`; existing posts get views/likes/
+    comments/last_updated_at refreshed and move under `owner` if they were
+    stored under another row of the handle.
+    """
+    now = datetime.utcnow()
+    rows = {}
     for raw in raw_posts:
-        existing = await db.execute(
-            select(CreatorPost).where(
-                CreatorPost.instagram_post_id == raw["post_id"]
-            )
+        rows[raw["post_id"]] = {
+            "creator_id": owner.id,
+            "instagram_post_id": raw["post_id"],
+            "post_url": raw.get("post_url"),
+            "caption": raw.get("caption"),
+            "post_type": raw.get("post_type"),
+            "posted_at": raw.get("posted_at"),
+            "views": raw.get("views", 0),
+            "likes": raw.get("likes", 0),
+            "comments": raw.get("comments", 0),
+            "detected_format": raw.get("detected_format"),
+            "detected_hook_type": raw.get("detected_hook_type"),
+            "content_analysis": raw.get("content_analysis"),
+            "first_seen_at": now,
+            "last_updated_at": now,
+        }
+    if not rows:
+        return []
+
+    dialect_insert = _UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if dialect_insert is not None:
+        stmt = dialect_insert(CreatorPost).values(list(rows.values()))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CreatorPost.instagram_post_id],
+            set_={
+                "creator_id": stmt.excluded.creator_id,
+                "views": stmt.excluded.views,
+                "likes": stmt.excluded.likes,
+                "comments": stmt.excluded.comments,
+                "last_updated_at": stmt.excluded.last_updated_at,
+            },
         )
-        post = existing.scalar_one_or_none()
-
-        if post is None:
-            post = CreatorPost(
-                creator_id=creator.id,
-                instagram_post_id=raw["post_id"],
-                post_url=raw.get("post_url"),
-                caption=raw.get("caption"),
-                post_type=raw.get("post_type"),
-                posted_at=raw.get("posted_at"),
-                views=raw.get("views", 0),
-                likes=raw.get("likes", 0),
-                comments=raw.get("comments", 0),
-                detected_format=raw.get("detected_format"),
-                detected_hook_type=raw.get("detected_hook_type"),
-                content_analysis=raw.get("content_analysis"),
-            )
-            db.add(post)
-        else:
-            post.views = raw.get("views", post.views)
-            post.likes = raw.get("likes", post.likes)
-            post.comments = raw.get("comments", post.comments)
-            post.last_updated_at = datetime.utcnow()
-
-        snapshot = PostSnapshot(
-            post_id=post.id if post.id else None,
-            views=raw.get("views", 0),
-            likes=raw.get("likes", 0),
-            comments=raw.get("comments", 0),
+        result = await db.scalars(
+            stmt.returning(CreatorPost),
+            execution_options={"populate_existing": True},
         )
+        return list(result.all())
 
-        await db.flush()
-        if snapshot.post_id is None:
-            snapshot.post_id = post.id
-        db.add(snapshot)
-        ingested.append(post)
-
-    # Recalculate creator averages
-    avg_result = await db.execute(
-        select(
-            func.avg(CreatorPost.views),
-            func.avg(CreatorPost.likes),
-            func.avg(CreatorPost.comments),
-        ).where(CreatorPost.creator_id == creator.id)
+    # Portable path: one IN query to resolve existing posts, one batched INSERT
+    existing_result = await db.scalars(
+        select(CreatorPost).where(CreatorPost.instagram_post_id.in_(list(rows)))
     )
-    avgs = avg_result.one()
-    creator.avg_views = avgs[0] or 0
-    creator.avg_likes = avgs[1] or 0
-    creator.avg_comments = avgs[2] or 0
-    creator.last_scraped_at = datetime.utcnow()
-
-    await db.commit()
-    return ingested
+    posts = []
+    for post in existing_result.all():
+        row = rows.pop(post.instagram_post_id)
+        post.creator_id = owner.id
+        post.views = row["views"]
+        post.likes = row["likes"]
+        post.comments = row["comments"]
+        post.last_updated_at = now
+        posts.append(post)
+    if rows:
+        inserted = await db.scalars(
+            insert(CreatorPost).returning(CreatorPost), list(rows.values())
+        )
+        posts.extend(inserted.all())
+    await db.flush()
+    return posts
@@ -1,41 +1,29 @@
 """
-Alert generation and push notification delivery.
-
-Generates the push notification payload from a spike detection,
-then delivers via Firebase Cloud Messaging. Falls back to logging
-for development.
+Alert generation.
+
+Renders the alert copy from spike detections and stores it as PENDING.
+`create_alerts` builds rows for any number of (user, spike, draft) triples
+and writes them in a single INSERT ... RETURNING, so a scan's alerts cost
+one round trip rather than a commit and refresh each. Delivery is not done
+here: the push queue dispatcher picks up pending alerts in batches (see
+push_queue.py), so a scan never waits on FCM. New alerts are also published
+to the live dashboard stream (see event_stream.py).
 """
 import logging
 from datetime import datetime
 
+from sqlalchemy import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.config import settings
-from app.models.models import User, VelocityAlert, AlertStatus, AlertUrgency, CreatorPost
+from app.models.models import User, VelocityAlert, AlertStatus, AlertUrgency
 from app.services.velocity import SpikeDetection
-from app.services.content_rewriter import generate_draft
+from app.services.alert_counts import count_new_alerts
+from app.services.content_rewriter import DraftContent, generate_draft
+from app.services.push_queue import push_dispatcher, can_push
+from app.services.event_stream import event_broker
 
 logger = logging.getLogger(__name__)
 
-# Firebase is optional — only imported if configured
-_fcm_app = None
-
-
-def _init_firebase():
-    global _fcm_app
-    if _fcm_app is not None:
-        return
-    if not settings.firebase_credentials_path:
-        return
-    try:
-        import firebase_admin
-        from firebase_admin import credentials
-        cred = credentials.Certificate(settings.firebase_credentials_path)
-        _fcm_app = firebase_admin.initialize_app(cred)
-    except Exception as e:
-        logger.warning(f"Firebase init failed (push notifications disabled): {e}")
-
-
 HEADLINE_TEMPLATES = {
     AlertUrgency.CRITICAL: (
         "{creator} just hit {views:,} views in {hours:.0f}h. "
@@ -78,16 +66,13 @@ BODY_TEMPLATES = {
 }
 
 
-async def generate_alert(
-    db: AsyncSession,
-    user: User,
-    spike: SpikeDetection,
-) -> VelocityAlert:
-    """Generate a complete alert with rewritten draft content."""
-    draft = await generate_draft(user, spike.post, spike.velocity_multiplier)
+_headline_formatters = {u: t.format_map for u, t in HEADLINE_TEMPLATES.items()}
+_body_formatters = {u: t.format_map for u, t in BODY_TEMPLATES.items()}
 
+
+def build_alert_row(user: User, spike: SpikeDetection, draft: DraftContent) -> dict:
+    """Column values for one alert, copy rendered from the urgency templates."""
     pillars = user.content_pillars or {}
-    narrative = pillars.get("primary_narrative", "your content")
     creator_handle = spike.post.creator.instagram_handle if spike.post.creator else "A creator"
     fmt = spike.post.detected_format or "content"
 
@@ -98,109 +83,85 @@ async def generate_alert(
         "multiplier": spike.velocity_multiplier,
         "format": fmt,
         "peak_hours": spike.estimated_peak_hours or 0,
-        "narrative": narrative,
+        "narrative": pillars.get("primary_narrative", "your content"),
     }
 
-    headline = HEADLINE_TEMPLATES[spike.urgency].format(**template_vars)
-    body = BODY_TEMPLATES[spike.urgency].format(**template_vars)
-
-    alert = VelocityAlert(
-        user_id=user.id,
-        post_id=spike.post.id,
-        creator_handle=creator_handle,
-        velocity_multiplier=spike.velocity_multiplier,
-        views_at_detection=spike.post.views,
-        hours_since_post=spike.hours_since_post,
-        detected_format=fmt,
-        alert_headline=headline,
-        alert_body=body,
-        draft_hook=draft.hook,
-        draft_structure=draft.structure,
-        rewrite_rationale=draft.rationale,
-        urgency=spike.urgency,
-        status=AlertStatus.PENDING,
-        estimated_peak_hours=spike.estimated_peak_hours,
-    )
-
-    db.add(alert)
-    await db.commit()
-    await db.refresh(alert)
+    return {
+        "user_id": user.id,
+        "post_id": spike.post.id,
+        "creator_handle": creator_handle,
+        "velocity_multiplier": spike.velocity_multiplier,
+        "views_at_detection": spike.post.views,
+        "hours_since_post": spike.hours_since_post,
+        "detected_format": fmt,
+        "alert_headline": _headline_formatters[spike.urgency](template_vars),
+        "alert_body": _body_formatters[spike.urgency](template_vars),
+        "draft_hook": draft.hook,
+        "draft_structure": draft.structure,
+        "rewrite_rationale": draft.rationale,
+        "urgency": spike.urgency,
+        "status": AlertStatus.PENDING,
+        "estimated_peak_hours": spike.estimated_peak_hours,
+        # Queue for push only if the user can receive one
+        "next_push_at": datetime.utcnow() if can_push(user) else None,
+    }
 
-    if user.push_token and user.notification_enabled:
-        await _send_push(user.push_token, alert)
 
-    return alert
+async def create_alerts(
+    db: AsyncSession,
+    items: list[tuple[User, SpikeDetection, DraftContent]],
+) -> list[VelocityAlert]:
+    """Insert alerts for many users and spikes at once, then wake the push queue."""
+    if not items:
+        return []
+
+    result = await db.scalars(
+        insert(VelocityAlert).returning(VelocityAlert, sort_by_parameter_order=True),
+        [build_alert_row(user, spike, draft) for user, spike, draft in items],
+    )
+    alerts = list(result.all())
+    await count_new_alerts(db, alerts)
+    await db.commit()
 
+    if any(can_push(user) for user, _, _ in items):
+        push_dispatcher.notify()
+    for alert in alerts:
+        event_broker.publish(alert.user_id, "alert", alert_event_data(alert))
+
+    return alerts
+
+
+def alert_event_data(alert: VelocityAlert) -> dict:
+    """Stream payload for a new alert, shaped like AlertResponse."""
+    return {
+        "id": alert.id,
+        "creator_handle": alert.creator_handle,
+        "velocity_multiplier": alert.velocity_multiplier,
+        "views_at_detection": alert.views_at_detection,
+        "hours_since_post": alert.hours_since_post,
+        "detected_format": alert.detected_format,
+        "alert_headline": alert.alert_headline,
+        "alert_body": alert.alert_body,
+        "draft_hook": alert.draft_hook,
+        "draft_structure": alert.draft_structure,
+        "rewrite_rationale": alert.rewrite_rationale,
+        "urgency": AlertUrgency(alert.urgency).value,
+        "status": AlertStatus(alert.status).value,
+        "estimated_peak_hours": alert.estimated_peak_hours,
+        "created_at": alert.created_at.isoformat(),
+        "sent_at": alert.sent_at.isoformat() if alert.sent_at else None,
+    }
 
-async def _send_push(token: str, alert: VelocityAlert) -> bool:
-    """Send push notification via FCM. Falls back to log output."""
-    _init_firebase()
 
-    payload = {
-        "title": _push_title(alert),
-        "body": alert.alert_headline,
-        "data": {
-            "alert_id": str(alert.id),
-            "urgency": alert.urgency,
-            "action": "open_draft",
-        },
-    }
+async def generate_alert(
+    db: AsyncSession,
+    user: User,
+    spike: SpikeDetection,
+    draft: DraftContent | None = None,
+) -> VelocityAlert:
+    """Generate a complete alert with rewritten draft content."""
+    if draft is None:
+        draft = await generate_draft(user, spike.post, spike.velocity_multiplier)
 
-    if _fcm_app is not None:
-        try:
-            from firebase_admin import messaging
-            message = messaging.Message(
-                notification=messaging.Notification(
-                    title=payload["title"],
-                    body=payload["body"],
-                ),
-                data=payload["data"],
-                token=token,
-                android=messaging.AndroidConfig(
-                    priority="high",
-                    notification=messaging.AndroidNotification(
-                        channel_id="velocity_alerts",
-                        priority="max",
-                    ),
-                ),
-                apns=messaging.APNSConfig(
-                    payload=messaging.APNSPayload(
-                        aps=messaging.Aps(
-                            alert=messaging.ApsAlert(
-                                title=payload["title"],
-                                body=payload["body"],
-                            ),
-                            sound="default",
-                            badge=1,
-                        ),
-                    ),
-                ),
-            )
-            messaging.send(message)
-            alert.status = AlertStatus.SENT
-            alert.sent_at = datetime.utcnow()
-            logger.info(f"Push sent for alert {alert.id} (urgency={alert.urgency})")
-            return True
-        except Exception as e:
-            logger.error(f"FCM send failed for alert {alert.id}: {e}")
-            return False
-    else:
-        logger.info(
-            f"[MOCK PUSH] Alert {alert.id} | {payload['title']}\n"
-            f"  → {payload['body']}\n"
-            f"  → Urgency: {alert.urgency} | Data: {payload['data']}"
-        )
-        alert.status = AlertStatus.SENT
-        alert.sent_at = datetime.utcnow()
-        return True
-
-
-def _push_title(alert: VelocityAlert) -> str:
-    urgency_prefix = {
-        AlertUrgency.CRITICAL: "WAVE ALERT",
-        AlertUrgency.HIGH: "Trend Spike",
-        AlertUrgency.MEDIUM: "Velocity Alert",
-        AlertUrgency.LOW: "Trend Watch",
-    }
-    prefix = urgency_prefix.get(AlertUrgency(alert.urgency), "Alert")
-    return f"{prefix} — {alert.creator_handle}"
+    alerts = await create_alerts(db, [(user, spike, draft)])
+    return alerts[0]
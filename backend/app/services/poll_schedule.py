@@ -0,0 +1,97 @@
+"""
+Adaptive per-creator polling.
+
+Rather than rescanning every creator on one fixed interval, each handle
+carries its own `next_poll_at`, set after every scan from what the scan saw:
+
+- hot: an accelerating spike on a post under `poll_hot_post_hours` old
+- spiking: any other spike still in the detection window
+- fresh: newest post within `poll_fresh_post_hours`
+- quiet: newest post within `poll_dormant_after_days`
+- dormant: nothing recent at all
+
+Each tier maps to an interval setting, so the scrape budget goes to the
+creators where a wave can still be caught early. A scheduler tick
+(`scanner.run_due_scans`) scans whichever handles are due.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from math import ceil
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import chunked
+from app.models.models import TrackedCreator
+from app.services.velocity import SpikeDetection
+
+logger = logging.getLogger(__name__)
+
+
+def poll_interval(
+    creator: TrackedCreator, spikes: list[SpikeDetection], now: datetime
+) -> tuple[str, timedelta]:
+    """Pick the polling tier and interval for a freshly scanned creator."""
+    if any(
+        spike.acceleration > 0 and spike.hours_since_post <= settings.poll_hot_post_hours
+        for spike in spikes
+    ):
+        return "hot", timedelta(minutes=settings.poll_interval_hot_minutes)
+    if spikes:
+        return "spiking", timedelta(minutes=settings.poll_interval_spiking_minutes)
+
+    newest = creator.last_seen_post_at or _newest_post_at(creator)
+    if newest is not None and now - newest <= timedelta(hours=settings.poll_fresh_post_hours):
+        return "fresh", timedelta(minutes=settings.polling_interval_minutes)
+    if newest is not None and now - newest <= timedelta(days=settings.poll_dormant_after_days):
+        return "quiet", timedelta(minutes=settings.poll_interval_quiet_minutes)
+    return "dormant", timedelta(minutes=settings.poll_interval_dormant_minutes)
+
+
+def _newest_post_at(creator: TrackedCreator) -> datetime | None:
+    # baseline_window values are [posted_at iso, views, likes, comments]
+    posted = [
+        entry[0] for entry in (creator.baseline_window or {}).values() if entry[0]
+    ]
+    return datetime.fromisoformat(max(posted)) if posted else None
+
+
+async def schedule_next_polls(
+    db: AsyncSession,
+    creators: list[TrackedCreator],
+    spikes_by_owner: dict[int, list[SpikeDetection]],
+    failed_handles: list[str],
+    retry_at: datetime | None = None,
+    deferred: dict[str, float] | None = None,
+):
+    """
+    Set `next_poll_at` on every row of each scanned handle. Handles whose
+    ingest failed retry at `retry_at` (e.g. when a tripped scraper circuit
+    closes), by default after the base interval rather than on the next
+    tick. `deferred` maps handles the scraper circuit turned away, without
+    trying them, to the seconds until it admits calls again; they keep their
+    place and are due again then. The caller commits.
+    """
+    now = datetime.utcnow()
+    # One UPDATE per distinct interval (a handful of tiers), not per handle
+    handles_by_poll: dict[datetime, list[str]] = defaultdict(list)
+    for creator in creators:
+        tier, interval = poll_interval(creator, spikes_by_owner.get(creator.id, []), now)
+        handles_by_poll[now + interval].append(creator.instagram_handle)
+        logger.debug(f"{creator.instagram_handle}: {tier}, next poll in {interval}")
+    if retry_at is None:
+        retry_at = now + timedelta(minutes=settings.polling_interval_minutes)
+    handles_by_poll[retry_at].extend(failed_handles)
+    for handle, retry_after in (deferred or {}).items():
+        # Whole seconds, so deferrals share a handful of UPDATEs
+        handles_by_poll[now + timedelta(seconds=ceil(retry_after))].append(handle)
+
+    for next_poll_at, handles in handles_by_poll.items():
+        for chunk in chunked(handles):
+            await db.execute(
+                update(TrackedCreator)
+                .where(TrackedCreator.instagram_handle.in_(chunk))
+                .values(next_poll_at=next_poll_at)
+            )
@@ -0,0 +1,363 @@
+"""
+Batched push notification delivery queue.
+
+Alerts are written as PENDING and never pushed inline. A single background
+dispatcher drains them in batches through a pluggable transport:
+
+- FCMTransport: Firebase `messaging.send_each`, run off the event loop
+- LogTransport: logs the payload (development default without Firebase)
+- FakeTransport: records messages with optional latency/failure injection,
+  for load testing the queue without a network
+
+An alert is queued by giving it a `next_push_at`, which only happens when
+its user can receive pushes (a token and notifications on); the dispatcher
+scans PENDING alerts in `next_push_at` order, so alerts that will never be
+pushed stay out of that range instead of being walked past on every poll.
+They simply stay PENDING in the dashboard.
+
+Successful sends are marked SENT with `sent_at` in one bulk UPDATE. Failures
+are retried with exponential backoff (`push_attempts`, `next_push_at`) and
+dead-lettered as FAILED after `push_max_attempts`, or immediately when the
+transport reports the token itself is bad. Alerts of users who dropped their
+token or muted notifications after the alert was queued are taken off the
+queue.
+"""
+import asyncio
+import logging
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import async_session
+from app.core.metrics import SCAN_STAGE_SECONDS, PUSH_RESULTS
+from app.models.models import User, VelocityAlert, AlertStatus, AlertUrgency
+from app.services.alert_counts import move_alert_status
+
+logger = logging.getLogger(__name__)
+
+# FCM send_each accepts at most 500 messages per call
+FCM_MAX_BATCH = 500
+
+
+@dataclass
+class PushMessage:
+    alert_id: int
+    token: str
+    title: str
+    body: str
+    data: dict[str, str]
+
+
+@dataclass
+class DeliveryResult:
+    ok: bool
+    error: str | None = None
+    retryable: bool = True
+
+
+def can_push(user: User) -> bool:
+    """Whether alerts for `user` should be queued for push delivery."""
+    return bool(user.push_token and user.notification_enabled)
+
+
+def build_message(alert: VelocityAlert, token: str) -> PushMessage:
+    return PushMessage(
+        alert_id=alert.id,
+        token=token,
+        title=_push_title(alert),
+        body=alert.alert_headline,
+        data={
+            "alert_id": str(alert.id),
+            "urgency": AlertUrgency(alert.urgency).value,
+            "action": "open_draft",
+        },
+    )
+
+
+def _push_title(alert: VelocityAlert) -> str:
+    urgency_prefix = {
+        AlertUrgency.CRITICAL: "WAVE ALERT",
+        AlertUrgency.HIGH: "Trend Spike",
+        AlertUrgency.MEDIUM: "Velocity Alert",
+        AlertUrgency.LOW: "Trend Watch",
+    }
+    prefix = urgency_prefix.get(AlertUrgency(alert.urgency), "Alert")
+    return f"{prefix} — {alert.creator_handle}"
+
+
+class LogTransport:
+    """Development transport: every push 'succeeds' into the log."""
+
+    async def send_batch(self, messages: list[PushMessage]) -> list[DeliveryResult]:
+        for message in messages:
+            logger.info(
+                f"[MOCK PUSH] Alert {message.alert_id} | {message.title}\n"
+                f"  → {message.body}\n"
+                f"  → Urgency: {message.data['urgency']} | Data: {message.data}"
+            )
+        return [DeliveryResult(ok=True) for _ in messages]
+
+
+class FakeTransport:
+    """Load-test transport: records messages, optionally slow or flaky."""
+
+    def __init__(self, latency_seconds: float = 0.0, failure_rate: float = 0.0):
+        self.latency_seconds = latency_seconds
+        self.failure_rate = failure_rate
+        self.sent: list[PushMessage] = []
+
+    async def send_batch(self, messages: list[PushMessage]) -> list[DeliveryResult]:
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+        results = []
+        for message in messages:
+            if random.random() < self.failure_rate:
+                results.append(DeliveryResult(ok=False, error="injected failure"))
+            else:
+                self.sent.append(message)
+                results.append(DeliveryResult(ok=True))
+        return results
+
+
+class FCMTransport:
+    """Firebase Cloud Messaging via send_each, on a worker thread."""
+
+    def __init__(self, app):
+        self._app = app
+
+    async def send_batch(self, messages: list[PushMessage]) -> list[DeliveryResult]:
+        from firebase_admin import messaging
+
+        fcm_messages = [self._to_fcm(messaging, m) for m in messages]
+        response = await asyncio.to_thread(
+            messaging.send_each, fcm_messages, app=self._app
+        )
+        results = []
+        for item in response.responses:
+            if item.success:
+                results.append(DeliveryResult(ok=True))
+                continue
+            # A dead token will never succeed; don't burn retries on it
+            permanent = isinstance(
+                item.exception,
+                (messaging.UnregisteredError, messaging.SenderIdMismatchError),
+            )
+            results.append(DeliveryResult(
+                ok=False, error=str(item.exception), retryable=not permanent
+            ))
+        return results
+
+    def _to_fcm(self, messaging, message: PushMessage):
+        return messaging.Message(
+            notification=messaging.Notification(
+                title=message.title,
+                body=message.body,
+            ),
+            data=message.data,
+            token=message.token,
+            android=messaging.AndroidConfig(
+                priority="high",
+                notification=messaging.AndroidNotification(
+                    channel_id="velocity_alerts",
+                    priority="max",
+                ),
+            ),
+            apns=messaging.APNSConfig(
+                payload=messaging.APNSPayload(
+                    aps=messaging.Aps(
+                        alert=messaging.ApsAlert(
+                            title=message.title,
+                            body=message.body,
+                        ),
+                        sound="default",
+                        badge=1,
+                    ),
+                ),
+            ),
+        )
+
+
+def _init_firebase():
+    # Firebase is optional — only imported if configured
+    if not settings.firebase_credentials_path:
+        return None
+    try:
+        import firebase_admin
+        from firebase_admin import credentials
+        cred = credentials.Certificate(settings.firebase_credentials_path)
+        return firebase_admin.initialize_app(cred)
+    except Exception as e:
+        logger.warning(f"Firebase init failed (push notifications disabled): {e}")
+        return None
+
+
+def get_transport():
+    """Pick the transport from `push_transport` (auto = FCM if configured, else log)."""
+    if settings.push_transport == "fake":
+        return FakeTransport()
+    if settings.push_transport == "log":
+        return LogTransport()
+    fcm_app = _init_firebase()
+    if fcm_app is not None:
+        return FCMTransport(fcm_app)
+    if settings.push_transport == "fcm":
+        logger.warning("push_transport=fcm but Firebase is unavailable, logging pushes")
+    return LogTransport()
+
+
+@dataclass
+class DispatcherStats:
+    sent: int = 0
+    retried: int = 0
+    dead_lettered: int = 0
+    batches: int = 0
+    last_batch_size: int = 0
+    last_drained_at: datetime | None = None
+
+
+@dataclass
+class PushDispatcher:
+    """Background worker that drains PENDING alerts in batches."""
+
+    transport: object = None
+    stats: DispatcherStats = field(default_factory=DispatcherStats)
+
+    def __post_init__(self):
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def notify(self):
+        """Wake the worker now instead of at the next poll."""
+        self._wakeup.set()
+
+    def start(self):
+        if self.transport is None:
+            self.transport = get_transport()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="push-dispatcher")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                # Keep draining while batches come back full
+                while await self.drain_once() >= self._batch_size():
+                    pass
+            except Exception as e:
+                logger.error(f"Push dispatch failed: {e}", exc_info=True)
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=settings.push_poll_interval_seconds
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def _batch_size(self) -> int:
+        return max(1, min(settings.push_batch_size, FCM_MAX_BATCH))
+
+    async def drain_once(self) -> int:
+        """Deliver one batch of due alerts. Returns how many were attempted."""
+        if self.transport is None:
+            self.transport = get_transport()
+        async with async_session() as db:
+            rows = await self._load_due(db)
+            if not rows:
+                return 0
+
+            due = [(alert, user.push_token) for alert, user in rows if can_push(user)]
+            unreachable = [alert.id for alert, user in rows if not can_push(user)]
+            if unreachable:
+                await db.execute(
+                    update(VelocityAlert)
+                    .where(VelocityAlert.id.in_(unreachable))
+                    .values(next_push_at=None)
+                )
+            if due:
+                messages = [build_message(alert, token) for alert, token in due]
+                with SCAN_STAGE_SECONDS.time(stage="push"):
+                    results = await self.transport.send_batch(messages)
+                await self._record(db, due, results)
+            await db.commit()
+
+        self.stats.batches += 1
+        self.stats.last_batch_size = len(due)
+        self.stats.last_drained_at = datetime.utcnow()
+        return len(rows)
+
+    async def _load_due(self, db: AsyncSession) -> list[tuple[VelocityAlert, User]]:
+        # A range scan of the (status, next_push_at) index; unqueued alerts
+        # (NULL next_push_at) are outside it
+        result = await db.execute(
+            select(VelocityAlert, User)
+            .join(User, User.id == VelocityAlert.user_id)
+            .where(
+                and_(
+                    VelocityAlert.status == AlertStatus.PENDING,
+                    VelocityAlert.next_push_at <= datetime.utcnow(),
+                )
+            )
+            .order_by(VelocityAlert.next_push_at)
+            .limit(self._batch_size())
+        )
+        return list(result.tuples().all())
+
+    async def _record(
+        self,
+        db: AsyncSession,
+        due: list[tuple[VelocityAlert, str]],
+        results: list[DeliveryResult],
+    ):
+        now = datetime.utcnow()
+        sent_ids = []
+        failed_ids = []
+        retries = []
+        for (alert, _), result in zip(due, results):
+            if result.ok:
+                sent_ids.append(alert.id)
+                continue
+            attempts = (alert.push_attempts or 0) + 1
+            give_up = not result.retryable or attempts >= settings.push_max_attempts
+            backoff = settings.push_retry_base_seconds * 2 ** (attempts - 1)
+            retries.append({
+                "id": alert.id,
+                "push_attempts": attempts,
+                "push_error": (result.error or "")[:500],
+                "next_push_at": None if give_up else now + timedelta(seconds=backoff),
+            })
+            if give_up:
+                failed_ids.append(alert.id)
+                self.stats.dead_lettered += 1
+                PUSH_RESULTS.inc(result="dead_lettered")
+                logger.warning(f"Push dead-lettered for alert {alert.id}: {result.error}")
+            else:
+                self.stats.retried += 1
+                PUSH_RESULTS.inc(result="retried")
+
+        # Status moves only apply to alerts still PENDING, so an alert the
+        # user opened or dismissed mid-delivery keeps its status
+        if sent_ids:
+            await move_alert_status(
+                db, sent_ids, AlertStatus.PENDING, AlertStatus.SENT, sent_at=now
+            )
+            self.stats.sent += len(sent_ids)
+            PUSH_RESULTS.inc(len(sent_ids), result="sent")
+        if retries:
+            await db.execute(update(VelocityAlert), retries)
+        if failed_ids:
+            await move_alert_status(db, failed_ids, AlertStatus.PENDING, AlertStatus.FAILED)
+
+
+push_dispatcher = PushDispatcher()
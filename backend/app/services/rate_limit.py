@@ -0,0 +1,182 @@
+"""
+Rate limiting for outbound scraping.
+
+All scan workers share one budget against Instagram:
+
+- TokenBucket: every live scraper call takes a token first, so concurrent
+  workers together never exceed `scraper_rate_per_minute` (with a small burst)
+- backoff_delay: exponential backoff with jitter between retries of a
+  throttled (HTTP 429) call
+- CircuitBreaker: after `scraper_breaker_failure_threshold` consecutive
+  throttles, scraping pauses for `scraper_breaker_cooldown_seconds`; calls
+  fail fast with ScraperCircuitOpen meanwhile, and the scanner defers the
+  creators it turned away to when the breaker admits calls again instead of
+  hammering.
+  After the cooldown a single probe call goes out; the rest keep failing
+  fast until it succeeds (closed) or is throttled (open again).
+"""
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ScraperThrottled(Exception):
+    """Instagram is throttling us (or the breaker is open); try again later."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ScraperCircuitOpen(ScraperThrottled):
+    """The breaker turned the call away before it reached Instagram."""
+
+
+class TokenBucket:
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate_per_second = rate_per_second
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waited_seconds = 0.0
+
+    async def acquire(self, tokens: float = 1.0):
+        """Wait until `tokens` are available, then take them. FIFO via the lock."""
+        async with self._lock:
+            self._refill()
+            if self._tokens < tokens:
+                wait = (tokens - self._tokens) / self.rate_per_second
+                self.waited_seconds += wait
+                await asyncio.sleep(wait)
+                self._refill()
+            self._tokens -= tokens
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate_per_second
+        )
+        self._updated = now
+
+    def stats(self) -> dict[str, float]:
+        self._refill()
+        return {
+            "tokens": round(self._tokens, 2),
+            "capacity": self.capacity,
+            "rate_per_minute": round(self.rate_per_second * 60, 2),
+            "waited_seconds": round(self.waited_seconds, 1),
+        }
+
+
+class CircuitBreaker:
+    """
+    closed -> open after N consecutive failures -> half-open after cooldown,
+    where one probe call decides between closed and open again.
+    """
+
+    def __init__(self, failure_threshold: int, cooldown_seconds: float):
+        self.failure_threshold = max(failure_threshold, 1)
+        self.cooldown_seconds = cooldown_seconds
+        self._failures = 0
+        self._opened_at: float | None = None
+        # Set while the half-open probe call is in flight
+        self._probing = False
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.cooldown_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """
+        Admit a call: always when closed, and when half-open only the first
+        (the probe) until it is recorded or abandoned.
+        """
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def accepting(self) -> bool:
+        """Whether a call would be admitted, without taking the probe slot."""
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self._probing)
+
+    def abandon_probe(self):
+        """The probe ended without a verdict (other error, cancelled); allow another."""
+        self._probing = False
+
+    def retry_after(self) -> float:
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self.cooldown_seconds - (time.monotonic() - self._opened_at))
+
+    def reopens_at(self) -> datetime | None:
+        """Wall-clock time scraping resumes, or None if the breaker is closed."""
+        state = self.state
+        if state == "half_open" and self._probing:
+            # Retry as soon as the probe resolves; ticks wait for it meanwhile
+            return datetime.utcnow()
+        if state != "open":
+            return None
+        return datetime.utcnow() + timedelta(seconds=self.retry_after())
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self._probing = False
+        self._failures += 1
+        if self.state == "half_open" or self._failures >= self.failure_threshold:
+            if self.state != "open":
+                self.trips += 1
+                logger.warning(
+                    f"Scraper circuit open for {self.cooldown_seconds:.0f}s "
+                    f"after {self._failures} throttled calls"
+                )
+            self._opened_at = time.monotonic()
+
+    def stats(self) -> dict[str, float | str]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "probe_in_flight": self._probing,
+            "trips": self.trips,
+            "retry_after_seconds": round(self.retry_after(), 1),
+        }
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with jitter for retry `attempt` (0-based)."""
+    ceiling = min(
+        settings.scraper_backoff_max_seconds,
+        settings.scraper_backoff_base_seconds * 2 ** attempt,
+    )
+    return random.uniform(ceiling / 2, ceiling)
+
+
+scrape_bucket = TokenBucket(
+    rate_per_second=settings.scraper_rate_per_minute / 60,
+    capacity=settings.scraper_rate_burst,
+)
+scrape_breaker = CircuitBreaker(
+    failure_threshold=settings.scraper_breaker_failure_threshold,
+    cooldown_seconds=settings.scraper_breaker_cooldown_seconds,
+)
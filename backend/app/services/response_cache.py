@@ -0,0 +1,171 @@
+"""
+Per-user data generations, ETags and a response cache for dashboard reads.
+
+The dashboard polls `/alerts`, `/velocity-feed` and `/creators/` far more
+often than their data changes: that only happens when a scan completes or an
+alert is created or changes status. Each user therefore has a generation
+number, bumped whenever a transaction that changed their data commits:
+
+- writes call `mark_changed(db, user_ids)` (alert counters and the velocity
+  feed refresh do this, so every alert insert, status move and scan is
+  covered); the bump happens in the session's after-commit hook, so nothing
+  is invalidated for a transaction that rolls back
+- `cached_response` serves a read as `ETag: W/"<generation>-<filled at>"`,
+  answers an `If-None-Match` of the current generation filled within the TTL
+  with 304 without querying anything, and otherwise reuses the cached body
+  for the same URL and generation
+
+A read captures the generation before it queries, so a body built while a
+write commits is stored under the old generation and never served.
+Generations live in this process, like the event broker, so they only see
+this API worker's writes. The TTL bounds staleness from writers this module
+doesn't see (other workers, a scanner in another process, migrations): a
+cached body expires `response_cache_ttl_seconds` after it was built, and the
+fill time in its ETag stops a client revalidating that copy past the same
+point.
+"""
+import itertools
+import time
+from collections.abc import Awaitable, Callable
+from functools import lru_cache
+from typing import Any
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+# Session.info key holding the users a transaction changed
+_CHANGED_USERS = "changed_user_ids"
+
+
+class DataGenerations:
+    """Monotonic per-user generation numbers."""
+
+    def __init__(self):
+        # Millisecond clock seed keeps ETags from repeating across restarts
+        self._counter = itertools.count(int(time.time() * 1000))
+        self._initial = next(self._counter)
+        self._generations: dict[int, int] = {}
+        self.bumps = 0
+
+    def get(self, user_id: int) -> int:
+        return self._generations.get(user_id, self._initial)
+
+    def bump(self, user_ids):
+        generation = next(self._counter)
+        for user_id in user_ids:
+            self._generations[user_id] = generation
+            self.bumps += 1
+
+
+class ResponseCache(TTLCache[tuple[int, str, bytes]]):
+    """
+    LRU + TTL cache of serialized responses as (generation, ETag, body),
+    each valid for its generation only.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        super().__init__(max_entries, ttl_seconds)
+        self.not_modified = 0
+
+    def lookup(self, key: str, generation: int) -> tuple[str, bytes] | None:
+        entry = self.peek(key)
+        if entry is None or entry[0] != generation:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1], entry[2]
+
+    def stats(self) -> dict[str, float]:
+        return {
+            **super().stats(),
+            "not_modified": self.not_modified,
+            "generation_bumps": data_generations.bumps,
+        }
+
+
+data_generations = DataGenerations()
+response_cache = ResponseCache(
+    max_entries=settings.response_cache_max_entries,
+    ttl_seconds=settings.response_cache_ttl_seconds,
+)
+
+
+def mark_changed(db: AsyncSession, user_ids):
+    """Invalidate these users' cached reads once `db` commits."""
+    db.info.setdefault(_CHANGED_USERS, set()).update(user_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_on_commit(session: Session):
+    user_ids = session.info.pop(_CHANGED_USERS, None)
+    if user_ids:
+        data_generations.bump(user_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_on_rollback(session: Session):
+    session.info.pop(_CHANGED_USERS, None)
+
+
+def _make_etag(generation: int, filled_at: int) -> str:
+    return f'W/"{generation}-{filled_at}"'
+
+
+def _fresh_etag(if_none_match: str | None, generation: int) -> str | None:
+    """The client's ETag if it is of `generation` and was filled within the TTL."""
+    if not if_none_match:
+        return None
+    now = time.time()
+    # Weak comparison: W/ prefixes are ignored (RFC 9110, If-None-Match)
+    for tag in if_none_match.split(","):
+        tag_generation, _, filled_at = tag.strip().removeprefix("W/").strip('"').partition("-")
+        try:
+            if (
+                int(tag_generation) == generation
+                and 0 <= now - int(filled_at) < response_cache.ttl_seconds
+            ):
+                return _make_etag(generation, int(filled_at))
+        except ValueError:
+            continue
+    return None
+
+
+@lru_cache
+def _adapter(response_model) -> TypeAdapter:
+    return TypeAdapter(response_model)
+
+
+async def cached_response(
+    request: Request,
+    user_id: int,
+    response_model,
+    build: Callable[[], Awaitable[Any]],
+) -> Response:
+    """
+    Serve `build()` for this URL as `response_model` JSON with an ETag,
+    answering 304 or from the cache when the user's data hasn't changed since
+    (and the copy is younger than the TTL).
+    """
+    generation = data_generations.get(user_id)
+    headers = {"Cache-Control": "private, no-cache"}
+    etag = _fresh_etag(request.headers.get("if-none-match"), generation)
+    if etag is not None:
+        response_cache.not_modified += 1
+        return Response(status_code=304, headers={**headers, "ETag": etag})
+
+    key = f"{request.url.path}?{sorted(request.query_params.multi_items())}"
+    cached = response_cache.lookup(key, generation)
+    if cached is not None:
+        etag, body = cached
+    else:
+        adapter = _adapter(response_model)
+        body = adapter.dump_json(adapter.validate_python(await build(), from_attributes=True))
+        etag = _make_etag(generation, int(time.time()))
+        response_cache.put(key, (generation, etag, body))
+    return Response(body, media_type="application/json", headers={**headers, "ETag": etag})
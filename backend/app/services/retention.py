@@ -0,0 +1,176 @@
+"""
+Snapshot retention and downsampling.
+
+Every scan writes a PostSnapshot per post, so post_snapshots grows without
+bound. This job keeps it bounded while preserving each post's curve:
+
+- within `snapshot_full_resolution_hours` (the detection window): every snapshot
+- up to `snapshot_hourly_retention_days`: the last snapshot of each hour
+- up to `snapshot_daily_retention_days`: the last snapshot of each day
+- posts published before that: no snapshots at all (posts with no publish
+  time just lose their snapshots older than that)
+
+Snapshots are cumulative counters, so the last sample in a bucket is an exact
+rollup of it. Work is done in batches of posts, one transaction each, so the
+job never holds a long write lock while the scanner is running.
+"""
+import logging
+import time
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, delete, func, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import async_session
+from app.models.models import CreatorPost, PostSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RetentionProgress:
+    running: bool = False
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    posts_processed: int = 0
+    snapshots_deleted: int = 0
+    last_duration_seconds: float | None = None
+
+
+retention_progress = RetentionProgress()
+
+
+async def run_snapshot_retention() -> dict:
+    """Downsample and expire old snapshots. Returns the final progress."""
+    if retention_progress.running:
+        logger.info("Snapshot retention already running, skipping")
+        return asdict(retention_progress)
+
+    now = datetime.utcnow()
+    full_cutoff = now - timedelta(hours=settings.snapshot_full_resolution_hours)
+    hourly_cutoff = now - timedelta(days=settings.snapshot_hourly_retention_days)
+    expiry_cutoff = now - timedelta(days=settings.snapshot_daily_retention_days)
+
+    retention_progress.running = True
+    retention_progress.started_at = now
+    retention_progress.posts_processed = 0
+    retention_progress.snapshots_deleted = 0
+    started = time.monotonic()
+
+    try:
+        last_post_id = 0
+        while True:
+            async with async_session() as db:
+                batch = await _next_post_batch(db, full_cutoff, last_post_id)
+                if not batch:
+                    break
+                deleted = await _expire_posts(db, batch, expiry_cutoff)
+                deleted += await _downsample(
+                    db, batch, "hour", hourly_cutoff, full_cutoff
+                )
+                deleted += await _downsample(
+                    db, batch, "day", expiry_cutoff, hourly_cutoff
+                )
+                await db.commit()
+
+            last_post_id = batch[-1]
+            retention_progress.posts_processed += len(batch)
+            retention_progress.snapshots_deleted += deleted
+    finally:
+        retention_progress.running = False
+        retention_progress.finished_at = datetime.utcnow()
+        retention_progress.last_duration_seconds = round(time.monotonic() - started, 2)
+
+    logger.info(
+        f"Snapshot retention complete: {retention_progress.posts_processed} posts, "
+        f"{retention_progress.snapshots_deleted} snapshots removed"
+    )
+    return asdict(retention_progress)
+
+
+async def _next_post_batch(
+    db: AsyncSession, full_cutoff: datetime, after_post_id: int
+) -> list[int]:
+    """Next batch of posts (by id) that have snapshots past full resolution."""
+    result = await db.execute(
+        select(PostSnapshot.post_id)
+        .where(
+            and_(
+                PostSnapshot.post_id > after_post_id,
+                PostSnapshot.captured_at < full_cutoff,
+            )
+        )
+        .group_by(PostSnapshot.post_id)
+        .order_by(PostSnapshot.post_id)
+        .limit(settings.snapshot_retention_batch_size)
+    )
+    return list(result.scalars().all())
+
+
+async def _expire_posts(
+    db: AsyncSession, post_ids: list[int], expiry_cutoff: datetime
+) -> int:
+    """
+    Drop every snapshot of posts published before the longest window, and
+    the snapshots past it of posts whose publish time is unknown.
+    """
+    expired_posts = select(CreatorPost.id).where(
+        and_(
+            CreatorPost.id.in_(post_ids),
+            CreatorPost.posted_at < expiry_cutoff,
+        )
+    )
+    result = await db.execute(
+        delete(PostSnapshot).where(PostSnapshot.post_id.in_(expired_posts))
+    )
+    deleted = result.rowcount or 0
+
+    undated_posts = select(CreatorPost.id).where(
+        and_(
+            CreatorPost.id.in_(post_ids),
+            CreatorPost.posted_at.is_(None),
+        )
+    )
+    result = await db.execute(
+        delete(PostSnapshot).where(
+            and_(
+                PostSnapshot.post_id.in_(undated_posts),
+                PostSnapshot.captured_at < expiry_cutoff,
+            )
+        )
+    )
+    return deleted + (result.rowcount or 0)
+
+
+async def _downsample(
+    db: AsyncSession,
+    post_ids: list[int],
+    unit: str,
+    older_than: datetime,
+    newer_than: datetime,
+) -> int:
+    """Keep only the newest snapshot per (post, `unit`) in [older_than, newer_than)."""
+    in_tier = and_(
+        PostSnapshot.post_id.in_(post_ids),
+        PostSnapshot.captured_at >= older_than,
+        PostSnapshot.captured_at < newer_than,
+    )
+    keep = (
+        select(func.max(PostSnapshot.id))
+        .where(in_tier)
+        .group_by(PostSnapshot.post_id, _bucket(db, unit))
+    )
+    result = await db.execute(
+        delete(PostSnapshot).where(and_(in_tier, PostSnapshot.id.not_in(keep)))
+    )
+    return result.rowcount or 0
+
+
+def _bucket(db: AsyncSession, unit: str):
+    """Truncate captured_at to the hour/day in the bound dialect."""
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date_trunc(unit, PostSnapshot.captured_at)
+    formats = {"hour": "%Y-%m-%d %H", "day": "%Y-%m-%d"}
+    return func.strftime(formats[unit], PostSnapshot.captured_at)
@@ -0,0 +1,109 @@
+"""
+Background jobs for manually triggered scans.
+
+`POST /users/{id}/scan` used to await a whole ingest -> rewrite -> alert
+cycle inside the request. Now it submits a job here and returns at once:
+the scan runs as a background task, at most one job per user is active at
+a time (repeat clicks get the running job back), and clients poll
+`GET /users/{id}/scan/{job_id}` for its ScanProgress. Jobs live in memory
+and finished ones are forgotten after `scan_job_ttl_minutes`.
+"""
+import asyncio
+import logging
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from app.core.config import settings
+from app.services.scanner import ScanProgress, run_velocity_scan
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ScanJob:
+    id: str
+    user_id: int
+    status: str = "queued"  # queued | running | completed | failed
+    progress: ScanProgress = field(default_factory=ScanProgress)
+    alert_ids: list[int] = field(default_factory=list)
+    error: str | None = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+
+class ScanJobRegistry:
+
+    def __init__(self, max_concurrency: int, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._slots = asyncio.Semaphore(max(max_concurrency, 1))
+        self._jobs: dict[str, ScanJob] = {}
+        self._active_by_user: dict[int, str] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def submit(self, user_id: int) -> ScanJob:
+        """Start a scan for `user_id`, or return the one already in progress."""
+        self._prune()
+        active_id = self._active_by_user.get(user_id)
+        if active_id is not None:
+            return self._jobs[active_id]
+
+        job = ScanJob(id=uuid.uuid4().hex, user_id=user_id)
+        self._jobs[job.id] = job
+        self._active_by_user[user_id] = job.id
+        task = asyncio.create_task(self._run(job), name=f"scan-job-{job.id}")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def get(self, job_id: str) -> ScanJob | None:
+        return self._jobs.get(job_id)
+
+    async def _run(self, job: ScanJob):
+        try:
+            async with self._slots:
+                job.status = "running"
+                job.started_at = datetime.utcnow()
+                result = await run_velocity_scan(
+                    user_id=job.user_id, progress=job.progress
+                )
+            job.alert_ids = [alert.id for alert in result["alerts"]]
+            job.status = "completed"
+        except Exception as e:
+            logger.error(f"Scan job {job.id} failed: {e}", exc_info=True)
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = datetime.utcnow()
+            self._active_by_user.pop(job.user_id, None)
+
+    def _prune(self):
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    async def shutdown(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "tracked": len(self._jobs),
+            "active": len(self._active_by_user),
+        }
+
+
+scan_jobs = ScanJobRegistry(
+    max_concurrency=settings.scan_job_max_concurrency,
+    ttl_seconds=settings.scan_job_ttl_minutes * 60,
+)
@@ -2,121 +2,451 @@
 Background velocity scanner.
 
 Orchestrates the full pipeline: ingest -> detect -> rewrite -> alert.
-Runs on a configurable interval via APScheduler.
+An APScheduler tick (`run_due_scans`) scans the creators whose adaptive
+next poll time has come due (see poll_schedule.py).
+
+Tracked creators are grouped by Instagram handle so each handle is fetched
+exactly once per cycle, however many users track it. A cycle runs in stages:
+handles are ingested concurrently, all of them are scored together in one
+vectorized VelocityEngine pass, the spikes are fanned out to every
+subscriber's draft generation, again concurrently, and all resulting alerts
+are written in a single bulk insert. Concurrent stages give
+each handle its own task and DB session, bounded by a global semaphore
+(`scan_concurrency`), so one slow or failing creator never stalls the cycle.
+A handle's fetch and ingest share a per-creator timeout; drafts are bounded
+per request instead (see content_rewriter.py), since a popular handle fans
+out to many subscribers and one slow draft must not cost the others. Their writes take the shared `write_lock`,
+so on SQLite handles are fetched in parallel but committed one at a time.
+
+Each stage is timed into the `/metrics` histograms (see core/metrics.py),
+along with per-creator durations and how late due creators are picked up.
 """
+import asyncio
 import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+from typing import Awaitable, Callable, TypeVar
 
-from sqlalchemy import select, and_
+from sqlalchemy import select, and_, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.core.database import async_session
+from app.core.database import async_session, chunked, write_lock
+from app.core.metrics import (
+    SCAN_STAGE_SECONDS, SCAN_DURATION_SECONDS, CREATOR_SCAN_SECONDS,
+    CREATOR_SCANS, SCAN_LAG_SECONDS, SCAN_LAG_MAX_SECONDS, SCAN_ITEMS,
+)
 from app.models.models import User, TrackedCreator, VelocityAlert, AlertStatus
-from app.services.instagram import ingest_creator_posts
-from app.services.velocity import VelocityEngine
-from app.services.notifications import generate_alert
+from app.services.instagram import (
+    get_scraper, ingest_creator_posts, incremental_fetch_cutoff,
+)
+from app.services.velocity import VelocityEngine, SpikeDetection
+from app.services.poll_schedule import schedule_next_polls
+from app.services.rate_limit import (
+    ScraperThrottled, ScraperCircuitOpen, scrape_breaker,
+)
+from app.services.notifications import create_alerts
+from app.services.velocity_feed import (
+    refresh_velocity_feeds, feed_subscribers, feed_event_data,
+)
+from app.services.event_stream import event_broker
+from app.services.content_rewriter import DraftContent, generate_draft
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+
+@dataclass
+class ScanProgress:
+    """Live counters for one scan cycle, updated as each stage advances."""
+    stage: str = "queued"
+    creators_total: int = 0
+    creators_done: int = 0
+    posts_scanned: int = 0
+    spikes_detected: int = 0
+    alerts_generated: int = 0
+
 
-async def run_velocity_scan(user_id: int | None = None):
+async def run_velocity_scan(
+    user_id: int | None = None,
+    progress: ScanProgress | None = None,
+    handles: list[str] | None = None,
+):
     """
     Execute a full scan cycle for one or all users.
 
     Pipeline:
-    1. For each user, fetch fresh data for all tracked creators
-    2. Run velocity detection on each creator's recent posts
-    3. For each spike above threshold, check cooldown and generate alert
-    4. Push notifications for new alerts
+    1. Fetch fresh data for each tracked handle once (concurrently)
+    2. Run velocity detection on all handles' recent posts in one pass
+    3. For each subscriber and spike, check cooldown and draft the rewrite
+    4. Insert every alert in one statement and wake the push queue, then
+       rematerialize the subscribers' velocity feeds and stream both to
+       their open dashboards
+
+    Pass `progress` to observe the cycle while it runs (manual scan jobs),
+    and `handles` to scan only those creators (the adaptive poll tick).
     """
+    if progress is None:
+        progress = ScanProgress()
+    started = time.perf_counter()
+
     async with async_session() as db:
-        if user_id:
-            users_result = await db.execute(
-                select(User).where(User.id == user_id)
-            )
-            users = [users_result.scalar_one_or_none()]
-            users = [u for u in users if u]
-        else:
-            users_result = await db.execute(select(User))
-            users = users_result.scalars().all()
-
-        total_posts = 0
-        total_spikes = 0
-        total_alerts = 0
-        all_alerts = []
-
-        engine = VelocityEngine()
-
-        for user in users:
-            creators_result = await db.execute(
-                select(TrackedCreator).where(
-                    and_(
-                        TrackedCreator.user_id == user.id,
-                        TrackedCreator.is_active == True,
-                    )
+        subscribers, owners = await _load_subscribers(db, user_id, handles)
+
+    semaphore = asyncio.Semaphore(max(settings.scan_concurrency, 1))
+    progress.stage = "ingest"
+    progress.creators_total = len(subscribers)
+
+    # Handles the scraper circuit turned away without trying them, with the
+    # seconds until it admits calls again. Recorded as they happen: by the
+    # time the stage ends a half-open probe has resolved either way
+    deferred: dict[str, float] = {}
+
+    async def ingest(handle: str) -> int | None:
+        def on_throttled(e: ScraperThrottled):
+            if isinstance(e, ScraperCircuitOpen):
+                deferred[handle] = e.retry_after
+
+        count = await _run_bounded(
+            semaphore,
+            f"creator {handle}",
+            _ingest_handle,
+            owners[handle],
+            timeout=settings.scan_creator_timeout_seconds,
+            on_throttled=on_throttled,
+        )
+        progress.creators_done += 1
+        progress.posts_scanned += count or 0
+        return count
+
+    # 1. Ingest: fetch each handle once, concurrently
+    ingested = await asyncio.gather(*(ingest(handle) for handle in subscribers))
+    posts_by_owner = {
+        owners[handle]: count
+        for handle, count in zip(subscribers, ingested)
+        if count is not None
+    }
+
+    # 2. Detect: score every freshly ingested handle in one vectorized pass
+    progress.stage = "detect"
+    async with async_session() as db:
+        owner_rows = await db.execute(
+            select(TrackedCreator).where(TrackedCreator.id.in_(list(posts_by_owner)))
+        )
+        scanned_owners = list(owner_rows.scalars().all())
+        with SCAN_STAGE_SECONDS.time(stage="detect"):
+            spikes_by_owner = await VelocityEngine().analyze_creators(db, scanned_owners)
+        async with write_lock:
+            # next_poll_at is shared by every subscriber of a handle, and a
+            # user-scoped scan only alerts its caller, so only scans that
+            # alert everyone may push the other subscribers' next poll out
+            if user_id is None:
+                await schedule_next_polls(
+                    db,
+                    scanned_owners,
+                    spikes_by_owner,
+                    [
+                        handle for handle in subscribers
+                        if owners[handle] not in posts_by_owner and handle not in deferred
+                    ],
+                    # While the breaker is open, failed creators wait for it to close
+                    retry_at=scrape_breaker.reopens_at(),
+                    deferred=deferred,
                 )
+            await db.commit()
+
+        alerting_user_ids = {
+            user_id
+            for handle, user_ids in subscribers.items()
+            if spikes_by_owner.get(owners[handle])
+            for user_id in user_ids
+        }
+        # Every (user, post) pair still in cooldown, fetched once for the cycle
+        with SCAN_STAGE_SECONDS.time(stage="cooldown"):
+            cooldowns = await _load_active_cooldowns(
+                db,
+                list(alerting_user_ids),
+                [
+                    spike.post.id
+                    for spikes in spikes_by_owner.values()
+                    for spike in spikes
+                ],
             )
-            creators = creators_result.scalars().all()
-
-            for creator in creators:
-                try:
-                    posts = await ingest_creator_posts(db, creator)
-                    total_posts += len(posts)
-
-                    spikes = await engine.analyze_creator(db, creator)
-                    total_spikes += len(spikes)
-
-                    for spike in spikes:
-                        if await _is_cooldown_active(db, user.id, spike.post.id):
-                            logger.debug(
-                                f"Skipping alert for post {spike.post.id} — cooldown active"
-                            )
-                            continue
-
-                        alert = await generate_alert(db, user, spike)
-                        total_alerts += 1
-                        all_alerts.append(alert)
-                        logger.info(
-                            f"Alert generated: {alert.creator_handle} "
-                            f"({spike.velocity_multiplier}x) for user {user.username}"
-                        )
-
-                except Exception as e:
-                    logger.error(
-                        f"Scan failed for creator {creator.instagram_handle}: {e}",
-                        exc_info=True,
-                    )
+        users = await _load_users(db, alerting_user_ids)
 
-        await db.commit()
+    progress.spikes_detected = sum(
+        len(spikes_by_owner.get(owners[handle], [])) * len(user_ids)
+        for handle, user_ids in subscribers.items()
+    )
+
+    # 3. Draft: fan each handle's spikes out to its subscribers, concurrently.
+    # No per-handle timeout: each draft request is bounded on its own
+    progress.stage = "draft"
+    alert_handles = [
+        handle for handle in subscribers if spikes_by_owner.get(owners[handle])
+    ]
+    drafted = await asyncio.gather(*(
+        _run_bounded(
+            semaphore,
+            f"creator {handle}",
+            _draft_alerts,
+            spikes_by_owner[owners[handle]],
+            [users[uid] for uid in subscribers[handle] if uid in users],
+            cooldowns,
+        )
+        for handle in alert_handles
+    ))
 
+    # 4. Alert: every alert of the cycle in one bulk insert
+    progress.stage = "alert"
+    async with async_session() as db, write_lock:
+        with SCAN_STAGE_SECONDS.time(stage="alert"):
+            all_alerts = await create_alerts(
+                db, [item for items in drafted if items for item in items]
+            )
+            # Rematerialize the velocity feed of everyone tracking a scanned
+            # handle: rescoring changed their posts even if the scan was
+            # scoped to one user
+            feeds = await refresh_velocity_feeds(
+                db, await feed_subscribers(db, list(subscribers))
+            )
+            await db.commit()
+    for feed_user_id, feed in feeds.items():
+        event_broker.publish(feed_user_id, "velocity_feed", feed_event_data(feed))
+    progress.alerts_generated = len(all_alerts)
+    progress.stage = "complete"
+    for alert in all_alerts:
         logger.info(
-            f"Scan complete: {total_posts} posts scanned, "
-            f"{total_spikes} spikes detected, {total_alerts} alerts generated"
+            f"Alert generated: {alert.creator_handle} "
+            f"({alert.velocity_multiplier}x) for user {alert.user_id}"
         )
-        return {
-            "posts_scanned": total_posts,
-            "spikes_detected": total_spikes,
-            "alerts_generated": total_alerts,
-            "alerts": all_alerts,
-        }
+
+    SCAN_DURATION_SECONDS.observe(time.perf_counter() - started)
+    SCAN_ITEMS.inc(progress.posts_scanned, kind="posts_scanned")
+    SCAN_ITEMS.inc(progress.spikes_detected, kind="spikes_detected")
+    SCAN_ITEMS.inc(len(all_alerts), kind="alerts_generated")
+    logger.info(
+        f"Scan complete: {len(subscribers)} creators, "
+        f"{progress.posts_scanned} posts scanned, "
+        f"{progress.spikes_detected} spikes detected, "
+        f"{len(all_alerts)} alerts generated"
+    )
+    return {
+        "posts_scanned": progress.posts_scanned,
+        "spikes_detected": progress.spikes_detected,
+        "alerts_generated": len(all_alerts),
+        "alerts": all_alerts,
+    }
 
 
-async def _is_cooldown_active(
-    db: AsyncSession, user_id: int, post_id: int
-) -> bool:
-    """Prevent duplicate alerts for the same post within the cooldown window."""
-    cooldown_cutoff = datetime.utcnow() - timedelta(
-        hours=settings.alert_cooldown_hours
+async def run_due_scans():
+    """Scheduler tick: scan the handles whose adaptive next poll is due."""
+    if not scrape_breaker.accepting():
+        logger.info(
+            f"Scraper circuit open, skipping poll tick "
+            f"({scrape_breaker.retry_after():.0f}s left)"
+        )
+        return None
+    async with async_session() as db:
+        due_at = await _load_due_handles(db)
+    if not due_at:
+        return None
+    due = list(due_at)
+    # Lag: how far behind schedule the tick is (grows when scans can't keep up)
+    now = datetime.utcnow()
+    lags = [(now - next_poll_at).total_seconds() for next_poll_at in due_at.values()]
+    for lag in lags:
+        SCAN_LAG_SECONDS.observe(lag)
+    SCAN_LAG_MAX_SECONDS.set(max(lags))
+    logger.info(f"{len(due)} creators due for polling")
+    return await run_velocity_scan(handles=due)
+
+
+async def _load_subscribers(
+    db: AsyncSession, user_id: int | None, handles: list[str] | None
+) -> tuple[dict[str, list[int]], dict[str, int]]:
+    """
+    The subscribers of every active handle in scope, and each handle's
+    canonical (oldest) creator id, which its posts are ingested under.
+    """
+    query = (
+        select(TrackedCreator.instagram_handle, TrackedCreator.user_id)
+        .join(User, User.id == TrackedCreator.user_id)
+        .where(TrackedCreator.is_active == True)
     )
+    if user_id:
+        query = query.where(TrackedCreator.user_id == user_id)
+    if handles is not None:
+        query = query.where(TrackedCreator.instagram_handle.in_(handles))
+
+    subscribers: dict[str, list[int]] = defaultdict(list)
+    for handle, subscriber_id in (await db.execute(query)).all():
+        subscribers[handle].append(subscriber_id)
+
+    owners = {}
+    for chunk in chunked(list(subscribers)):
+        result = await db.execute(
+            select(TrackedCreator.instagram_handle, func.min(TrackedCreator.id))
+            .where(TrackedCreator.instagram_handle.in_(chunk))
+            .group_by(TrackedCreator.instagram_handle)
+        )
+        owners.update(result.all())
+    return subscribers, owners
+
+
+async def _load_due_handles(db: AsyncSession) -> dict[str, datetime]:
+    """Handles whose next poll has come due, earliest first, with their due time."""
+    # Every row of a handle shares its next_poll_at, so (handle, due time)
+    # pairs are distinct per handle and the range search stays indexed
     result = await db.execute(
-        select(VelocityAlert).where(
+        select(TrackedCreator.instagram_handle, TrackedCreator.next_poll_at)
+        .where(
             and_(
-                VelocityAlert.user_id == user_id,
-                VelocityAlert.post_id == post_id,
-                VelocityAlert.created_at >= cooldown_cutoff,
-                VelocityAlert.status != AlertStatus.EXPIRED,
+                TrackedCreator.is_active == True,
+                TrackedCreator.next_poll_at <= datetime.utcnow(),
             )
         )
+        .distinct()
+        .order_by(TrackedCreator.next_poll_at)
+        .limit(settings.poll_max_handles_per_tick)
+    )
+    due_at = {}
+    for handle, next_poll_at in result.all():
+        due_at.setdefault(handle, next_poll_at)
+    return due_at
+
+
+async def _run_bounded(
+    semaphore: asyncio.Semaphore,
+    label: str,
+    stage: Callable[..., Awaitable[T]],
+    *args,
+    timeout: float | None = None,
+    on_throttled: Callable[[ScraperThrottled], None] | None = None,
+) -> T | None:
+    """
+    Run one creator's stage under the concurrency limit and `timeout`.
+    `on_throttled` sees the ScraperThrottled of a deferred stage.
+    """
+    stage_name = stage.__name__.lstrip("_")
+    async with semaphore:
+        try:
+            result = await asyncio.wait_for(stage(*args), timeout=timeout)
+            CREATOR_SCANS.inc(stage=stage_name, outcome="ok")
+            return result
+        except ScraperThrottled as e:
+            CREATOR_SCANS.inc(stage=stage_name, outcome="throttled")
+            if on_throttled is not None:
+                on_throttled(e)
+            logger.warning(
+                f"Scan deferred for {label}: {e} (retry in {e.retry_after:.0f}s)"
+            )
+        except asyncio.TimeoutError:
+            CREATOR_SCANS.inc(stage=stage_name, outcome="timeout")
+            logger.error(f"Scan timed out for {label} after {timeout}s")
+        except Exception as e:
+            CREATOR_SCANS.inc(stage=stage_name, outcome="error")
+            logger.error(f"Scan failed for {label}: {e}", exc_info=True)
+    return None
+
+
+async def _ingest_handle(owner_id: int) -> int:
+    """Fetch a handle once and ingest it under its canonical creator row."""
+    with CREATOR_SCAN_SECONDS.time():
+        async with async_session() as db:
+            owner = await db.get(TrackedCreator, owner_id)
+            if owner is None:
+                return 0
+            since = incremental_fetch_cutoff(owner, datetime.utcnow())
+            scraper = get_scraper()
+            with SCAN_STAGE_SECONDS.time(stage="scrape"):
+                raw_posts = await scraper.fetch_recent_posts(
+                    owner.instagram_handle,
+                    max_posts=settings.baseline_post_count,
+                    since=since,
+                )
+            # Fetch concurrently, but write one handle at a time
+            async with write_lock:
+                with SCAN_STAGE_SECONDS.time(stage="ingest"):
+                    posts = await ingest_creator_posts(
+                        db, owner, raw_posts, full_refresh=since is None
+                    )
+            return len(posts)
+
+
+async def _draft_alerts(
+    spikes: list[SpikeDetection],
+    users: list[User],
+    cooldowns: set[tuple[int, int]],
+) -> list[tuple[User, SpikeDetection, DraftContent]]:
+    """
+    Draft an alert for every subscriber of a handle, honouring cooldowns.
+
+    `cooldowns` is shared by the whole cycle; a pair is claimed before its
+    draft is generated so concurrent tasks can never alert it twice.
+    """
+    pending: list[tuple[User, SpikeDetection]] = []
+    for user in users:
+        for spike in spikes:
+            if (user.id, spike.post.id) in cooldowns:
+                logger.debug(
+                    f"Skipping alert for post {spike.post.id} — cooldown active"
+                )
+                continue
+            cooldowns.add((user.id, spike.post.id))
+            pending.append((user, spike))
+
+    # Rewrites are the slow part; request them all at once (bounded and
+    # de-duplicated inside the content rewriter)
+    drafts = await asyncio.gather(*(
+        _timed_draft(user, spike) for user, spike in pending
+    ))
+    return [(user, spike, draft) for (user, spike), draft in zip(pending, drafts)]
+
+
+async def _timed_draft(user: User, spike: SpikeDetection) -> DraftContent:
+    with SCAN_STAGE_SECONDS.time(stage="draft"):
+        return await generate_draft(user, spike.post, spike.velocity_multiplier)
+
+
+async def _load_users(db: AsyncSession, user_ids: set[int]) -> dict[int, User]:
+    users = {}
+    for chunk in chunked(list(user_ids)):
+        result = await db.execute(select(User).where(User.id.in_(chunk)))
+        users.update((user.id, user) for user in result.scalars().all())
+    return users
+
+
+async def _load_active_cooldowns(
+    db: AsyncSession, user_ids: list[int], post_ids: list[int]
+) -> set[tuple[int, int]]:
+    """
+    (user_id, post_id) pairs alerted within the cooldown window, so duplicate
+    alerts for the same post are skipped. Served by the composite
+    (user_id, post_id, created_at) index on velocity_alerts.
+    """
+    if not user_ids or not post_ids:
+        return set()
+    cooldown_cutoff = datetime.utcnow() - timedelta(
+        hours=settings.alert_cooldown_hours
     )
-    return result.scalar_one_or_none() is not None
+    unique_posts = list(set(post_ids))
+    active = set()
+    for chunk in chunked(list(set(user_ids))):
+        result = await db.execute(
+            select(VelocityAlert.user_id, VelocityAlert.post_id)
+            .where(
+                and_(
+                    VelocityAlert.user_id.in_(chunk),
+                    VelocityAlert.post_id.in_(unique_posts),
+                    VelocityAlert.created_at >= cooldown_cutoff,
+                    VelocityAlert.status != AlertStatus.EXPIRED,
+                )
+            )
+            .distinct()
+        )
+        active.update(tuple(row) for row in result.all())
+    return active
@@ -0,0 +1,100 @@
+"""
+Execution layer for blocking scraper work.
+
+instaloader is fully synchronous (requests + paged iterators), so calling it
+from a coroutine freezes the event loop for every network round trip. All
+instaloader work runs here instead, on a dedicated bounded thread pool.
+Each call gets a timeout and a cancellation flag that the worker checks
+between pages, and the pool reports its queue depth for /health.
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ScrapeCancelled(Exception):
+    """Raised inside a worker once its call has been cancelled or timed out."""
+
+
+class ScrapeExecutor:
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max(max_workers, 1)
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="scraper"
+        )
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._timed_out = 0
+
+    async def run(
+        self,
+        fn: Callable[..., T],
+        *args: Any,
+        timeout: float | None = None,
+    ) -> T:
+        """
+        Run `fn(*args, cancel_event)` on the pool.
+
+        `fn` must check `cancel_event.is_set()` between network round trips
+        and bail out with ScrapeCancelled; a running thread cannot be killed.
+        """
+        cancel_event = threading.Event()
+        with self._lock:
+            self._queued += 1
+        future = self._pool.submit(self._call, fn, args, cancel_event)
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future),
+                timeout=timeout or settings.scraper_call_timeout_seconds,
+            )
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._timed_out += 1
+            logger.warning(f"Scraper call {fn.__name__}{args} timed out")
+            raise
+        finally:
+            cancel_event.set()
+            if future.cancel():
+                # Never started, so _call won't get to decrement the queue
+                with self._lock:
+                    self._queued -= 1
+
+    def _call(self, fn: Callable[..., T], args: tuple, cancel_event: threading.Event) -> T:
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+        try:
+            if cancel_event.is_set():
+                raise ScrapeCancelled()
+            return fn(*args, cancel_event)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "queue_depth": self._queued,
+                "running": self._running,
+                "completed": self._completed,
+                "timed_out": self._timed_out,
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+scrape_executor = ScrapeExecutor(settings.scraper_max_workers)
@@ -3,23 +3,42 @@ Velocity detection engine.
 
 Calculates view velocity, detects multiplier spikes, estimates peak timing,
 and scores urgency. This is the algorithmic core that decides when to fire alerts.
+
+Scoring is vectorized: posts from any number of creators are laid out as
+columnar NumPy arrays (a PostBatch) and every metric is computed with a
+handful of array operations, so per-post Python overhead stays out of scans
+that evaluate hundreds of thousands of posts.
 """
 import logging
-import math
 from datetime import datetime, timedelta
 from dataclasses import dataclass
 
 import numpy as np
-from sqlalchemy import select, and_
+from sqlalchemy import select, and_, func
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
 
 from app.core.config import settings
+from app.core.database import chunked
 from app.models.models import (
     TrackedCreator, CreatorPost, PostSnapshot, AlertUrgency
 )
 
 logger = logging.getLogger(__name__)
 
+# Trailing snapshots per post used for acceleration and confidence
+SNAPSHOT_WINDOW = 5
+# Posts older than this are out of the detection window
+ANALYSIS_WINDOW_HOURS = 72
+
+# BatchScores.urgency holds indices into this tuple
+URGENCY_LEVELS = (
+    AlertUrgency.CRITICAL,
+    AlertUrgency.HIGH,
+    AlertUrgency.MEDIUM,
+    AlertUrgency.LOW,
+)
+
 
 @dataclass
 class SpikeDetection:
@@ -33,6 +52,35 @@ class SpikeDetection:
     confidence: float             # 0-1 confidence this is a real spike
 
 
+@dataclass
+class PostBatch:
+    """
+    Columnar scoring input, one row per post. Snapshot matrices hold up to
+    SNAPSHOT_WINDOW captures per post, oldest first, right-aligned and
+    NaN-padded; capture times are in hours relative to any common origin.
+    """
+    post_ids: np.ndarray          # (n,)
+    hours_since: np.ndarray       # (n,) NaN when posted_at is unknown
+    views: np.ndarray             # (n,) current views
+    baseline_views: np.ndarray    # (n,) creator baseline for each post
+    baseline_mad: np.ndarray      # (n,) NaN or 0 when the baseline has no spread
+    snapshot_hours: np.ndarray    # (n, SNAPSHOT_WINDOW)
+    snapshot_views: np.ndarray    # (n, SNAPSHOT_WINDOW)
+
+
+@dataclass
+class BatchScores:
+    post_ids: np.ndarray
+    evaluated: np.ndarray         # enough signal to score at all
+    velocity_multiplier: np.ndarray
+    view_velocity: np.ndarray
+    acceleration: np.ndarray
+    estimated_peak_hours: np.ndarray
+    urgency: np.ndarray           # indices into URGENCY_LEVELS
+    confidence: np.ndarray
+    is_spike: np.ndarray
+
+
 class VelocityEngine:
 
     def __init__(self, spike_threshold: float | None = None):
@@ -42,153 +90,285 @@ class VelocityEngine:
         self, db: AsyncSession, creator: TrackedCreator
     ) -> list[SpikeDetection]:
         """Analyze all recent posts from a creator for velocity spikes."""
-        cutoff = datetime.utcnow() - timedelta(hours=72)
-        result = await db.execute(
-            select(CreatorPost).where(
-                and_(
-                    CreatorPost.creator_id == creator.id,
-                    CreatorPost.posted_at >= cutoff,
-                )
-            ).order_by(CreatorPost.posted_at.desc())
-        )
-        recent_posts = result.scalars().all()
-        if not recent_posts:
-            return []
+        spikes = await self.analyze_creators(db, [creator])
+        return spikes.get(creator.id, [])
+
+    async def analyze_creators(
+        self, db: AsyncSession, creators: list[TrackedCreator]
+    ) -> dict[int, list[SpikeDetection]]:
+        """
+        Analyze recent posts from many creators in one vectorized pass.
 
-        baseline_views = creator.avg_views or 1
-        spikes = []
+        Returns spikes per creator id, strongest first. Velocity fields on the
+        scored posts are updated in the session; the caller commits.
+        """
+        creators_by_id = {creator.id: creator for creator in creators}
+        now = datetime.utcnow()
+        cutoff = now - timedelta(hours=ANALYSIS_WINDOW_HOURS)
+
+        recent_posts: list[CreatorPost] = []
+        for chunk in chunked(list(creators_by_id)):
+            result = await db.execute(
+                select(CreatorPost).where(
+                    and_(
+                        CreatorPost.creator_id.in_(chunk),
+                        CreatorPost.posted_at >= cutoff,
+                    )
+                ).order_by(CreatorPost.posted_at.desc())
+            )
+            recent_posts.extend(result.scalars().all())
+        if not recent_posts:
+            return {}
 
         for post in recent_posts:
-            detection = await self._evaluate_post(db, post, baseline_views)
-            if detection and detection.velocity_multiplier >= self.spike_threshold:
-                spikes.append(detection)
-
-        spikes.sort(key=lambda s: s.velocity_multiplier, reverse=True)
+            # Spikes outlive this session; attach the already-loaded creator
+            set_committed_value(post, "creator", creators_by_id[post.creator_id])
+
+        batch = await self._build_batch(db, recent_posts, creators_by_id, now)
+        scores = self.score_batch(batch)
+
+        spikes: dict[int, list[SpikeDetection]] = {}
+        for i in np.flatnonzero(scores.evaluated):
+            post = recent_posts[i]
+            multiplier = float(scores.velocity_multiplier[i])
+            post.view_velocity = float(scores.view_velocity[i])
+            post.velocity_multiplier = multiplier
+            post.hours_since_post = float(batch.hours_since[i])
+            post.is_spike = bool(scores.is_spike[i])
+
+            if round(multiplier, 2) < self.spike_threshold:
+                continue
+            spikes.setdefault(post.creator_id, []).append(SpikeDetection(
+                post=post,
+                velocity_multiplier=round(multiplier, 2),
+                view_velocity=round(float(scores.view_velocity[i]), 1),
+                hours_since_post=round(float(batch.hours_since[i]), 1),
+                acceleration=round(float(scores.acceleration[i]), 3),
+                estimated_peak_hours=round(float(scores.estimated_peak_hours[i]), 1),
+                urgency=URGENCY_LEVELS[scores.urgency[i]],
+                confidence=round(float(scores.confidence[i]), 2),
+            ))
+
+        for creator_spikes in spikes.values():
+            creator_spikes.sort(key=lambda s: s.velocity_multiplier, reverse=True)
         return spikes
 
-    async def _evaluate_post(
-        self, db: AsyncSession, post: CreatorPost, baseline_views: float
-    ) -> SpikeDetection | None:
-        if not post.posted_at:
-            return None
-
-        hours_since = (datetime.utcnow() - post.posted_at).total_seconds() / 3600
-        if hours_since < 0.5:
-            return None  # too early, not enough signal
-
-        current_views = post.views or 0
-        if current_views < settings.min_views_threshold:
-            return None
-
-        velocity_multiplier = current_views / max(baseline_views, 1)
-
-        snapshots_result = await db.execute(
-            select(PostSnapshot)
-            .where(PostSnapshot.post_id == post.id)
-            .order_by(PostSnapshot.captured_at.asc())
+    async def _build_batch(
+        self,
+        db: AsyncSession,
+        posts: list[CreatorPost],
+        creators_by_id: dict[int, TrackedCreator],
+        now: datetime,
+    ) -> PostBatch:
+        post_ids = [post.id for post in posts]
+        posted_at = np.array(
+            [post.posted_at or np.datetime64("NaT") for post in posts],
+            dtype="datetime64[us]",
         )
-        snapshots = snapshots_result.scalars().all()
-
-        view_velocity = current_views / max(hours_since, 0.5)
-        acceleration = self._calculate_acceleration(snapshots)
-        estimated_peak = self._estimate_peak_hours(
-            hours_since, velocity_multiplier, acceleration
+        # Median resists the very outliers we're hunting for; mean is the fallback
+        baselines = {
+            creator_id: (
+                creator.median_views or creator.avg_views or 1,
+                creator.mad_views or np.nan,
+            )
+            for creator_id, creator in creators_by_id.items()
+        }
+        baseline = np.array([baselines[post.creator_id] for post in posts], dtype=float)
+        snapshot_hours, snapshot_views = await self._load_snapshot_matrices(
+            db, post_ids, now
         )
-        urgency = self._score_urgency(velocity_multiplier, hours_since, acceleration)
-        confidence = self._calculate_confidence(
-            len(snapshots), velocity_multiplier, hours_since
+        return PostBatch(
+            post_ids=np.array(post_ids),
+            hours_since=(np.datetime64(now, "us") - posted_at) / np.timedelta64(1, "h"),
+            views=np.array([post.views or 0 for post in posts], dtype=float),
+            baseline_views=baseline[:, 0],
+            baseline_mad=baseline[:, 1],
+            snapshot_hours=snapshot_hours,
+            snapshot_views=snapshot_views,
         )
 
-        post.view_velocity = view_velocity
-        post.velocity_multiplier = velocity_multiplier
-        post.hours_since_post = hours_since
-        post.is_spike = velocity_multiplier >= self.spike_threshold
-
-        return SpikeDetection(
-            post=post,
-            velocity_multiplier=round(velocity_multiplier, 2),
-            view_velocity=round(view_velocity, 1),
-            hours_since_post=round(hours_since, 1),
-            acceleration=round(acceleration, 3),
-            estimated_peak_hours=round(estimated_peak, 1),
-            urgency=urgency,
-            confidence=round(confidence, 2),
-        )
-
-    def _calculate_acceleration(self, snapshots: list[PostSnapshot]) -> float:
+    async def _load_snapshot_matrices(
+        self, db: AsyncSession, post_ids: list[int], now: datetime
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Trailing SNAPSHOT_WINDOW snapshots for every post via a windowed query,
+        so cost doesn't grow with how long a post has been tracked. Returns
+        (capture hours relative to `now`, views) matrices aligned with post_ids.
+        """
+        index = {post_id: i for i, post_id in enumerate(post_ids)}
+        hours = np.full((len(post_ids), SNAPSHOT_WINDOW), np.nan)
+        views = np.full((len(post_ids), SNAPSHOT_WINDOW), np.nan)
+
+        for chunk in chunked(post_ids):
+            ranked = (
+                select(
+                    PostSnapshot.post_id,
+                    PostSnapshot.captured_at,
+                    PostSnapshot.views,
+                    func.row_number().over(
+                        partition_by=PostSnapshot.post_id,
+                        order_by=(PostSnapshot.captured_at.desc(), PostSnapshot.id.desc()),
+                    ).label("rn"),
+                )
+                .where(PostSnapshot.post_id.in_(chunk))
+                .subquery()
+            )
+            result = await db.execute(
+                select(ranked.c.post_id, ranked.c.captured_at, ranked.c.views, ranked.c.rn)
+                .where(ranked.c.rn <= SNAPSHOT_WINDOW)
+            )
+            rows = result.all()
+            if not rows:
+                continue
+            snap_post_ids, captured_at, snap_views, rank = zip(*rows)
+            row_idx = np.fromiter((index[p] for p in snap_post_ids), dtype=int, count=len(rows))
+            col_idx = SNAPSHOT_WINDOW - np.array(rank, dtype=int)
+            captured = np.array(captured_at, dtype="datetime64[us]")
+            hours[row_idx, col_idx] = (
+                (captured - np.datetime64(now, "us")) / np.timedelta64(1, "h")
+            )
+            views[row_idx, col_idx] = snap_views
+
+        return hours, views
+
+    def score_batch(self, batch: PostBatch) -> BatchScores:
+        """Score every post in the batch with array operations only."""
+        hours = batch.hours_since
+        views = batch.views
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # Too early (< 30 min) or too small to carry a signal
+            evaluated = (
+                np.isfinite(hours)
+                & (hours >= 0.5)
+                & (views >= settings.min_views_threshold)
+            )
+            multiplier = views / np.maximum(batch.baseline_views, 1)
+            view_velocity = views / np.maximum(hours, 0.5)
+            acceleration = self._calculate_acceleration(
+                batch.snapshot_hours, batch.snapshot_views
+            )
+            snapshot_count = np.isfinite(batch.snapshot_hours).sum(axis=1)
+            confidence = self._calculate_confidence(
+                snapshot_count,
+                multiplier,
+                hours,
+                self._robust_z(views, batch.baseline_views, batch.baseline_mad),
+            )
+            return BatchScores(
+                post_ids=batch.post_ids,
+                evaluated=evaluated,
+                velocity_multiplier=multiplier,
+                view_velocity=view_velocity,
+                acceleration=acceleration,
+                estimated_peak_hours=self._estimate_peak_hours(
+                    hours, multiplier, acceleration
+                ),
+                urgency=self._score_urgency(multiplier, hours, acceleration),
+                confidence=confidence,
+                is_spike=evaluated & (multiplier >= self.spike_threshold),
+            )
+
+    def _calculate_acceleration(
+        self, snapshot_hours: np.ndarray, snapshot_views: np.ndarray
+    ) -> np.ndarray:
         """
         Positive = views accelerating (wave still building).
         Negative = views decelerating (wave cresting/dying).
+
+        Least-squares slope of the per-interval view velocities against their
+        index, in closed form: sum((x - x̄)(y - ȳ)) / sum((x - x̄)²). Intervals
+        with missing or non-increasing timestamps are skipped, as are posts
+        with fewer than two usable intervals (slope 0).
         """
-        if len(snapshots) < 2:
-            return 0.0
-
-        recent = snapshots[-min(5, len(snapshots)):]
-        if len(recent) < 2:
-            return 0.0
-
-        velocities = []
-        for i in range(1, len(recent)):
-            dt = (recent[i].captured_at - recent[i - 1].captured_at).total_seconds() / 3600
-            if dt > 0:
-                dv = (recent[i].views - recent[i - 1].views) / dt
-                velocities.append(dv)
-
-        if len(velocities) < 2:
-            return 0.0
-
-        # Linear regression slope on velocity values = acceleration
-        x = np.arange(len(velocities), dtype=float)
-        y = np.array(velocities, dtype=float)
-        if np.std(x) == 0:
-            return 0.0
-        slope = np.polyfit(x, y, 1)[0]
-        return float(slope)
+        dt = np.diff(snapshot_hours, axis=1)
+        dv = np.diff(snapshot_views, axis=1)
+        valid = np.isfinite(dt) & (dt > 0) & np.isfinite(dv)
+        velocity = np.where(valid, dv / np.where(valid, dt, 1), 0.0)
+
+        # x is each velocity's position among the usable intervals
+        count = valid.sum(axis=1)
+        x = np.where(valid, np.cumsum(valid, axis=1) - 1, 0).astype(float)
+        safe_count = np.maximum(count, 1)
+        x_mean = (x * valid).sum(axis=1) / safe_count
+        y_mean = (velocity * valid).sum(axis=1) / safe_count
+        x_dev = np.where(valid, x - x_mean[:, None], 0.0)
+        y_dev = np.where(valid, velocity - y_mean[:, None], 0.0)
+
+        denominator = (x_dev ** 2).sum(axis=1)
+        slope = (x_dev * y_dev).sum(axis=1) / np.where(denominator > 0, denominator, 1)
+        return np.where(count >= 2, slope, 0.0)
 
     def _estimate_peak_hours(
-        self, hours_since: float, multiplier: float, acceleration: float
-    ) -> float:
+        self, hours_since: np.ndarray, multiplier: np.ndarray, acceleration: np.ndarray
+    ) -> np.ndarray:
         """
         Estimate how many hours until the algorithmic wave peaks.
 
         Uses a logistic decay model: viral posts on Instagram typically peak
         between 4-24 hours. Higher acceleration means the peak is further out.
         """
-        if acceleration <= 0:
-            # Already decelerating — peak is now or passed
-            return max(0, 2 - hours_since * 0.5)
+        # Already decelerating — peak is now or passed
+        decelerating = np.maximum(0, 2 - hours_since * 0.5)
 
         # Base peak time depends on the multiplier magnitude
         # Higher multiplier = algorithm is pushing harder = longer wave
-        base_peak = 6 + math.log(max(multiplier, 1)) * 4
+        base_peak = 6 + np.log(np.maximum(multiplier, 1)) * 4
 
         # Acceleration shifts peak forward
-        accel_factor = min(acceleration / 1000, 2.0)
-        estimated = base_peak * (1 + accel_factor * 0.3) - hours_since
+        accel_factor = np.minimum(acceleration / 1000, 2.0)
+        accelerating = np.maximum(
+            base_peak * (1 + accel_factor * 0.3) - hours_since, 0.5
+        )
 
-        return max(estimated, 0.5)
+        return np.where(acceleration > 0, accelerating, decelerating)
 
     def _score_urgency(
-        self, multiplier: float, hours_since: float, acceleration: float
-    ) -> AlertUrgency:
-        if multiplier >= 5.0 and hours_since <= 3:
-            return AlertUrgency.CRITICAL
-        if multiplier >= 3.0 and hours_since <= 6:
-            return AlertUrgency.HIGH
-        if multiplier >= self.spike_threshold:
-            if acceleration > 0:
-                return AlertUrgency.HIGH
-            return AlertUrgency.MEDIUM
-        return AlertUrgency.LOW
+        self, multiplier: np.ndarray, hours_since: np.ndarray, acceleration: np.ndarray
+    ) -> np.ndarray:
+        """Urgency per post as an index into URGENCY_LEVELS (first match wins)."""
+        conditions = [
+            (multiplier >= 5.0) & (hours_since <= 3),
+            (multiplier >= 3.0) & (hours_since <= 6),
+            (multiplier >= self.spike_threshold) & (acceleration > 0),
+            multiplier >= self.spike_threshold,
+        ]
+        choices = [
+            URGENCY_LEVELS.index(AlertUrgency.CRITICAL),
+            URGENCY_LEVELS.index(AlertUrgency.HIGH),
+            URGENCY_LEVELS.index(AlertUrgency.HIGH),
+            URGENCY_LEVELS.index(AlertUrgency.MEDIUM),
+        ]
+        return np.select(
+            conditions, choices, default=URGENCY_LEVELS.index(AlertUrgency.LOW)
+        )
+
+    def _robust_z(
+        self, views: np.ndarray, median: np.ndarray, mad: np.ndarray
+    ) -> np.ndarray:
+        """
+        Distance from the baseline median in robust (MAD-scaled) std devs;
+        NaN where the baseline has no spread.
+        """
+        scale = np.where(mad > 0, 1.4826 * mad, np.nan)
+        return (views - median) / scale
 
     def _calculate_confidence(
-        self, snapshot_count: int, multiplier: float, hours_since: float
-    ) -> float:
+        self,
+        snapshot_count: np.ndarray,
+        multiplier: np.ndarray,
+        hours_since: np.ndarray,
+        robust_z: np.ndarray,
+    ) -> np.ndarray:
         """
         Higher confidence when we have more data points and the signal is strong.
-        Low confidence for brand-new posts with few snapshots.
+        Low confidence for brand-new posts with few snapshots. When the baseline
+        has a spread (MAD), signal strength is how far outside it the post is.
         """
-        data_confidence = min(snapshot_count / 5, 1.0)
-        signal_strength = min((multiplier - 1) / 5, 1.0)
-        time_confidence = min(hours_since / 3, 1.0)
+        data_confidence = np.minimum(snapshot_count / SNAPSHOT_WINDOW, 1.0)
+        signal_strength = np.where(
+            np.isfinite(robust_z),
+            np.minimum(np.maximum(robust_z, 0) / 5, 1.0),
+            np.minimum((multiplier - 1) / 5, 1.0),
+        )
+        time_confidence = np.minimum(hours_since / 3, 1.0)
         return data_confidence * 0.4 + signal_strength * 0.4 + time_confidence * 0.2
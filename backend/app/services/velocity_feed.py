@@ -0,0 +1,251 @@
+"""
+Materialized per-user velocity feeds.
+
+The dashboard polls `GET /velocity-feed` constantly, and building it means
+ranking every post of every tracked creator and checking each against the
+user's alerts. Instead, the ranked top `velocity_feed_size` items, spike
+count and last scan time are written to one `velocity_feeds` row per user
+whenever the underlying data changes (after each scan cycle, and when the
+user tracks or untracks a creator), so the endpoint is a primary-key read.
+
+Feeds for many users are built together: each handle's top posts are
+ranked once in SQL, whoever tracks it, and merged per user in Python.
+"""
+import heapq
+import logging
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import select, delete, insert, func, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import chunked
+from app.models.models import TrackedCreator, CreatorPost, VelocityAlert, VelocityFeed
+from app.services.response_cache import mark_changed
+
+logger = logging.getLogger(__name__)
+
+CAPTION_PREVIEW_CHARS = 120
+
+
+async def build_velocity_feeds(
+    db: AsyncSession, user_ids: list[int]
+) -> dict[int, dict]:
+    """Compute feeds for `user_ids`: {user_id: {items, spike_count, last_scan_at}}."""
+    feeds = {
+        user_id: {"items": [], "spike_count": 0, "last_scan_at": None}
+        for user_id in user_ids
+    }
+
+    creators_by_user: dict[int, list[TrackedCreator]] = defaultdict(list)
+    for chunk in chunked(list(feeds)):
+        result = await db.scalars(
+            select(TrackedCreator).where(
+                and_(
+                    TrackedCreator.user_id.in_(chunk),
+                    TrackedCreator.is_active == True,
+                )
+            )
+        )
+        for creator in result.all():
+            creators_by_user[creator.user_id].append(creator)
+    if not creators_by_user:
+        return feeds
+
+    # Posts live under the canonical (oldest) row for each handle
+    handles = list({
+        creator.instagram_handle
+        for creators in creators_by_user.values()
+        for creator in creators
+    })
+    owner_by_handle = {}
+    for chunk in chunked(handles):
+        result = await db.execute(
+            select(TrackedCreator.instagram_handle, func.min(TrackedCreator.id))
+            .where(TrackedCreator.instagram_handle.in_(chunk))
+            .group_by(TrackedCreator.instagram_handle)
+        )
+        owner_by_handle.update(result.all())
+
+    posts_by_owner = await _top_posts_by_owner(db, list(owner_by_handle.values()))
+
+    # Rank each user's feed from the per-handle top lists
+    ranked_by_user = {}
+    for user_id, creators in creators_by_user.items():
+        candidates = [
+            (post, creator)
+            for creator in creators
+            for post in posts_by_owner.get(owner_by_handle[creator.instagram_handle], [])
+        ]
+        ranked_by_user[user_id] = heapq.nlargest(
+            settings.velocity_feed_size, candidates, key=lambda item: _rank(item[0])
+        )
+
+    alerted = await _alerted_posts(db, ranked_by_user)
+
+    for user_id, ranked in ranked_by_user.items():
+        items = [
+            {
+                "creator_handle": creator.instagram_handle,
+                "creator_name": creator.display_name,
+                "post_url": post.post_url,
+                "caption_preview": post.caption_preview or "",
+                "views": post.views,
+                "velocity_multiplier": post.velocity_multiplier or 0,
+                "hours_since_post": post.hours_since_post or 0,
+                "detected_format": post.detected_format,
+                "is_spike": post.is_spike or False,
+                "alert_generated": (user_id, post.id) in alerted,
+            }
+            for post, creator in ranked
+        ]
+        feeds[user_id] = {
+            "items": items,
+            "spike_count": sum(item["is_spike"] for item in items),
+            "last_scan_at": max(
+                (c.last_scraped_at for c in creators_by_user[user_id] if c.last_scraped_at),
+                default=None,
+            ),
+        }
+    return feeds
+
+
+def _rank(post) -> tuple[bool, float, int]:
+    # Highest multiplier first, posts never scored last, newest id on ties
+    return post.velocity_multiplier is not None, post.velocity_multiplier or 0, post.id
+
+
+async def _top_posts_by_owner(db: AsyncSession, owner_ids: list[int]) -> dict[int, list]:
+    """Each creator's top `velocity_feed_size` posts by multiplier, ranked in SQL."""
+    posts_by_owner = defaultdict(list)
+    for chunk in chunked(owner_ids):
+        ranked = (
+            select(
+                CreatorPost.id,
+                CreatorPost.creator_id,
+                CreatorPost.post_url,
+                func.substr(CreatorPost.caption, 1, CAPTION_PREVIEW_CHARS).label(
+                    "caption_preview"
+                ),
+                CreatorPost.views,
+                CreatorPost.velocity_multiplier,
+                CreatorPost.hours_since_post,
+                CreatorPost.detected_format,
+                CreatorPost.is_spike,
+                func.row_number().over(
+                    partition_by=CreatorPost.creator_id,
+                    order_by=(
+                        CreatorPost.velocity_multiplier.desc().nulls_last(),
+                        CreatorPost.id.desc(),
+                    ),
+                ).label("rn"),
+            )
+            .where(CreatorPost.creator_id.in_(chunk))
+            .subquery()
+        )
+        result = await db.execute(
+            select(ranked).where(ranked.c.rn <= settings.velocity_feed_size)
+        )
+        for post in result.all():
+            posts_by_owner[post.creator_id].append(post)
+    return posts_by_owner
+
+
+async def _alerted_posts(
+    db: AsyncSession, ranked_by_user: dict[int, list]
+) -> set[tuple[int, int]]:
+    """(user_id, post_id) pairs among the ranked posts that produced an alert."""
+    post_ids = list({post.id for ranked in ranked_by_user.values() for post, _ in ranked})
+    user_ids = [user_id for user_id, ranked in ranked_by_user.items() if ranked]
+    if not post_ids or not user_ids:
+        return set()
+    alerted = set()
+    for user_chunk in chunked(user_ids):
+        for post_chunk in chunked(post_ids):
+            result = await db.execute(
+                select(VelocityAlert.user_id, VelocityAlert.post_id)
+                .where(
+                    and_(
+                        VelocityAlert.user_id.in_(user_chunk),
+                        VelocityAlert.post_id.in_(post_chunk),
+                    )
+                )
+                .distinct()
+            )
+            alerted.update(tuple(row) for row in result.all())
+    return alerted
+
+
+async def refresh_velocity_feeds(
+    db: AsyncSession, user_ids: list[int]
+) -> dict[int, dict]:
+    """Rebuild and store the feeds of `user_ids`, returning them. The caller commits."""
+    user_ids = list(set(user_ids))
+    if not user_ids:
+        return {}
+    feeds = await build_velocity_feeds(db, user_ids)
+    now = datetime.utcnow()
+    for chunk in chunked(user_ids):
+        await db.execute(delete(VelocityFeed).where(VelocityFeed.user_id.in_(chunk)))
+    await db.execute(
+        insert(VelocityFeed),
+        [
+            {"user_id": user_id, **feed, "refreshed_at": now}
+            for user_id, feed in feeds.items()
+        ],
+    )
+    # A refresh follows every scan and (un)track, which also change the
+    # users' creator lists, so it invalidates all of their cached reads
+    mark_changed(db, user_ids)
+    logger.debug(f"Refreshed velocity feeds for {len(user_ids)} users")
+    return feeds
+
+
+def feed_event_data(feed: dict) -> dict:
+    """
+    Stream payload for a refreshed feed: counts plus the spiking items only,
+    small enough to buffer for resume; clients refetch the feed for the rest.
+    """
+    return {
+        "spike_count": feed["spike_count"],
+        "last_scan_at": feed["last_scan_at"].isoformat() if feed["last_scan_at"] else None,
+        "spikes": [item for item in feed["items"] if item["is_spike"]],
+    }
+
+
+async def feed_subscribers(db: AsyncSession, handles: list[str]) -> list[int]:
+    """Every user actively tracking any of `handles`."""
+    user_ids = set()
+    for chunk in chunked(handles):
+        result = await db.scalars(
+            select(TrackedCreator.user_id).where(
+                and_(
+                    TrackedCreator.instagram_handle.in_(chunk),
+                    TrackedCreator.is_active == True,
+                )
+            )
+        )
+        user_ids.update(result.all())
+    return list(user_ids)
+
+
+async def refresh_feeds_for_handle(db: AsyncSession, handle: str):
+    """Rebuild the feed of every user tracking `handle`. The caller commits."""
+    await refresh_velocity_feeds(db, await feed_subscribers(db, [handle]))
+
+
+async def load_velocity_feed(db: AsyncSession, user_id: int) -> dict:
+    """
+    The stored feed for `user_id`, or one computed on the spot if it hasn't
+    been materialized yet (e.g. before the first scan after an upgrade).
+    """
+    feed = await db.get(VelocityFeed, user_id)
+    if feed is not None:
+        return {
+            "items": feed.items or [],
+            "spike_count": feed.spike_count,
+            "last_scan_at": feed.last_scan_at,
+        }
+    feeds = await build_velocity_feeds(db, [user_id])
+    return feeds[user_id]
@@ -0,0 +1,133 @@
+"""Baseline schema: users, tracked creators, posts, snapshots, alerts
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+URGENCY = sa.Enum("CRITICAL", "HIGH", "MEDIUM", "LOW", name="alerturgency")
+STATUS = sa.Enum(
+    "PENDING", "SENT", "OPENED", "ACTED_ON", "DISMISSED", "EXPIRED",
+    name="alertstatus",
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("username", sa.String(255), nullable=False),
+        sa.Column("instagram_handle", sa.String(255), nullable=True),
+        sa.Column("content_pillars", sa.JSON(), nullable=True),
+        sa.Column("niche_tags", sa.JSON(), nullable=True),
+        sa.Column("push_token", sa.Text(), nullable=True),
+        sa.Column("notification_enabled", sa.Boolean(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    op.create_table(
+        "tracked_creators",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("instagram_handle", sa.String(255), nullable=False),
+        sa.Column("display_name", sa.String(255), nullable=True),
+        sa.Column("follower_count", sa.Integer(), nullable=True),
+        sa.Column("avg_views", sa.Float(), nullable=True),
+        sa.Column("avg_likes", sa.Float(), nullable=True),
+        sa.Column("avg_comments", sa.Float(), nullable=True),
+        sa.Column("last_scraped_at", sa.DateTime(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_tracked_creators_user_id", "tracked_creators", ["user_id"])
+    op.create_index(
+        "ix_tracked_creators_instagram_handle", "tracked_creators", ["instagram_handle"]
+    )
+
+    op.create_table(
+        "creator_posts",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column(
+            "creator_id", sa.Integer(), sa.ForeignKey("tracked_creators.id"), nullable=False
+        ),
+        sa.Column("instagram_post_id", sa.String(255), nullable=False),
+        sa.Column("post_url", sa.Text(), nullable=True),
+        sa.Column("caption", sa.Text(), nullable=True),
+        sa.Column("post_type", sa.String(50), nullable=True),
+        sa.Column("posted_at", sa.DateTime(), nullable=True),
+        sa.Column("views", sa.Integer(), nullable=False),
+        sa.Column("likes", sa.Integer(), nullable=False),
+        sa.Column("comments", sa.Integer(), nullable=False),
+        sa.Column("shares", sa.Integer(), nullable=True),
+        sa.Column("view_velocity", sa.Float(), nullable=True),
+        sa.Column("velocity_multiplier", sa.Float(), nullable=True),
+        sa.Column("hours_since_post", sa.Float(), nullable=True),
+        sa.Column("is_spike", sa.Boolean(), nullable=False),
+        sa.Column("detected_format", sa.String(100), nullable=True),
+        sa.Column("detected_hook_type", sa.String(100), nullable=True),
+        sa.Column("content_analysis", sa.JSON(), nullable=True),
+        sa.Column("first_seen_at", sa.DateTime(), nullable=False),
+        sa.Column("last_updated_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_creator_posts_creator_id", "creator_posts", ["creator_id"])
+    op.create_index(
+        "ix_creator_posts_instagram_post_id", "creator_posts", ["instagram_post_id"],
+        unique=True,
+    )
+
+    op.create_table(
+        "post_snapshots",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column(
+            "post_id", sa.Integer(), sa.ForeignKey("creator_posts.id"), nullable=False
+        ),
+        sa.Column("views", sa.Integer(), nullable=False),
+        sa.Column("likes", sa.Integer(), nullable=False),
+        sa.Column("comments", sa.Integer(), nullable=False),
+        sa.Column("captured_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_post_snapshots_post_id", "post_snapshots", ["post_id"])
+
+    op.create_table(
+        "velocity_alerts",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column(
+            "post_id", sa.Integer(), sa.ForeignKey("creator_posts.id"), nullable=False
+        ),
+        sa.Column("creator_handle", sa.String(255), nullable=False),
+        sa.Column("velocity_multiplier", sa.Float(), nullable=False),
+        sa.Column("views_at_detection", sa.Integer(), nullable=False),
+        sa.Column("hours_since_post", sa.Float(), nullable=False),
+        sa.Column("detected_format", sa.String(100), nullable=True),
+        sa.Column("alert_headline", sa.Text(), nullable=False),
+        sa.Column("alert_body", sa.Text(), nullable=False),
+        sa.Column("draft_hook", sa.Text(), nullable=True),
+        sa.Column("draft_structure", sa.JSON(), nullable=True),
+        sa.Column("rewrite_rationale", sa.Text(), nullable=True),
+        sa.Column("urgency", URGENCY, nullable=False),
+        sa.Column("status", STATUS, nullable=False),
+        sa.Column("estimated_peak_hours", sa.Float(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("sent_at", sa.DateTime(), nullable=True),
+        sa.Column("opened_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_velocity_alerts_user_id", "velocity_alerts", ["user_id"])
+
+
+def downgrade() -> None:
+    op.drop_table("velocity_alerts")
+    op.drop_table("post_snapshots")
+    op.drop_table("creator_posts")
+    op.drop_table("tracked_creators")
+    op.drop_table("users")
+    URGENCY.drop(op.get_bind(), checkfirst=True)
+    STATUS.drop(op.get_bind(), checkfirst=True)
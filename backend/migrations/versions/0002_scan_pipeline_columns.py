@@ -0,0 +1,60 @@
+"""Scan pipeline columns: robust baselines, adaptive polling, push queue
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("tracked_creators") as batch:
+        batch.add_column(sa.Column("median_views", sa.Float(), nullable=True))
+        batch.add_column(sa.Column("mad_views", sa.Float(), nullable=True))
+        batch.add_column(sa.Column("baseline_window", sa.JSON(), nullable=True))
+        batch.add_column(sa.Column("baseline_refreshed_at", sa.DateTime(), nullable=True))
+        batch.add_column(sa.Column("last_seen_post_at", sa.DateTime(), nullable=True))
+        batch.add_column(sa.Column("next_poll_at", sa.DateTime(), nullable=True))
+        batch.create_index("ix_tracked_creators_next_poll_at", ["next_poll_at"])
+
+    if op.get_bind().dialect.name == "postgresql":
+        # Native enum; ADD VALUE cannot run inside a transaction block
+        with op.get_context().autocommit_block():
+            op.execute("ALTER TYPE alertstatus ADD VALUE IF NOT EXISTS 'FAILED'")
+
+    with op.batch_alter_table("velocity_alerts") as batch:
+        batch.add_column(
+            sa.Column("push_attempts", sa.Integer(), nullable=False, server_default="0")
+        )
+        batch.add_column(sa.Column("next_push_at", sa.DateTime(), nullable=True))
+        batch.add_column(sa.Column("push_error", sa.Text(), nullable=True))
+        batch.create_index(
+            "ix_velocity_alerts_user_post_created", ["user_id", "post_id", "created_at"]
+        )
+        batch.create_index(
+            "ix_velocity_alerts_status_next_push", ["status", "next_push_at"]
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("velocity_alerts") as batch:
+        batch.drop_index("ix_velocity_alerts_status_next_push")
+        batch.drop_index("ix_velocity_alerts_user_post_created")
+        batch.drop_column("push_error")
+        batch.drop_column("next_push_at")
+        batch.drop_column("push_attempts")
+
+    with op.batch_alter_table("tracked_creators") as batch:
+        batch.drop_index("ix_tracked_creators_next_poll_at")
+        batch.drop_column("next_poll_at")
+        batch.drop_column("last_seen_post_at")
+        batch.drop_column("baseline_refreshed_at")
+        batch.drop_column("baseline_window")
+        batch.drop_column("mad_views")
+        batch.drop_column("median_views")
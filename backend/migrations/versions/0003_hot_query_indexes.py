@@ -0,0 +1,76 @@
+"""Composite indexes for the hot query shapes
+
+Replaces the single-column FK indexes on creator_posts.creator_id,
+post_snapshots.post_id and velocity_alerts.user_id with composites that
+lead with the same column, so lookups stay indexed and each insert
+maintains one fewer index. The push queue index becomes (status,
+created_at) so pending alerts are walked oldest first straight off the
+index, and next_poll_at is backfilled so "due" is a plain range search.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_creator_posts_creator_posted", "creator_posts", ["creator_id", "posted_at"]
+    )
+    op.create_index(
+        "ix_creator_posts_creator_multiplier",
+        "creator_posts",
+        ["creator_id", "velocity_multiplier"],
+    )
+    op.drop_index("ix_creator_posts_creator_id", table_name="creator_posts")
+
+    op.create_index(
+        "ix_post_snapshots_post_captured", "post_snapshots", ["post_id", "captured_at"]
+    )
+    op.drop_index("ix_post_snapshots_post_id", table_name="post_snapshots")
+
+    op.create_index(
+        "ix_velocity_alerts_user_created", "velocity_alerts", ["user_id", "created_at"]
+    )
+    op.create_index(
+        "ix_velocity_alerts_user_status", "velocity_alerts", ["user_id", "status"]
+    )
+    op.drop_index("ix_velocity_alerts_user_id", table_name="velocity_alerts")
+
+    op.create_index(
+        "ix_velocity_alerts_status_created", "velocity_alerts", ["status", "created_at"]
+    )
+    op.drop_index("ix_velocity_alerts_status_next_push", table_name="velocity_alerts")
+
+    # New creators now default to "due now" instead of NULL
+    op.execute(
+        sa.text(
+            "UPDATE tracked_creators SET next_poll_at = "
+            "COALESCE(last_scraped_at, created_at) WHERE next_poll_at IS NULL"
+        )
+    )
+
+
+def downgrade() -> None:
+    op.create_index(
+        "ix_velocity_alerts_status_next_push", "velocity_alerts", ["status", "next_push_at"]
+    )
+    op.drop_index("ix_velocity_alerts_status_created", table_name="velocity_alerts")
+
+    op.create_index("ix_velocity_alerts_user_id", "velocity_alerts", ["user_id"])
+    op.drop_index("ix_velocity_alerts_user_status", table_name="velocity_alerts")
+    op.drop_index("ix_velocity_alerts_user_created", table_name="velocity_alerts")
+
+    op.create_index("ix_post_snapshots_post_id", "post_snapshots", ["post_id"])
+    op.drop_index("ix_post_snapshots_post_captured", table_name="post_snapshots")
+
+    op.create_index("ix_creator_posts_creator_id", "creator_posts", ["creator_id"])
+    op.drop_index("ix_creator_posts_creator_multiplier", table_name="creator_posts")
+    op.drop_index("ix_creator_posts_creator_posted", table_name="creator_posts")
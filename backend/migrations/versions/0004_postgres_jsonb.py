@@ -0,0 +1,52 @@
+"""JSONB for JSON columns on Postgres
+
+The models map JSON columns to JSONB on Postgres (binary storage, no
+reparse on read, indexable). SQLite keeps plain JSON text, so this is a
+no-op there.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+JSON_COLUMNS = [
+    ("users", "content_pillars"),
+    ("users", "niche_tags"),
+    ("tracked_creators", "baseline_window"),
+    ("creator_posts", "content_analysis"),
+    ("velocity_alerts", "draft_structure"),
+]
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    for table, column in JSON_COLUMNS:
+        op.alter_column(
+            table,
+            column,
+            type_=postgresql.JSONB(),
+            existing_type=sa.JSON(),
+            postgresql_using=f"{column}::jsonb",
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    for table, column in JSON_COLUMNS:
+        op.alter_column(
+            table,
+            column,
+            type_=sa.JSON(),
+            existing_type=postgresql.JSONB(),
+            postgresql_using=f"{column}::json",
+        )
@@ -0,0 +1,54 @@
+"""Per-user alert status counters and keyset index for the alert feed
+
+Adds alert_status_counts (backfilled from velocity_alerts) and widens the
+(user_id, created_at) feed index with id, the keyset pagination tiebreaker.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+ALERT_STATUSES = (
+    "PENDING", "SENT", "OPENED", "ACTED_ON", "DISMISSED", "EXPIRED", "FAILED",
+)
+
+
+def upgrade() -> None:
+    # Reuse the alertstatus enum velocity_alerts already created on Postgres
+    status_type = sa.Enum(*ALERT_STATUSES, name="alertstatus").with_variant(
+        postgresql.ENUM(*ALERT_STATUSES, name="alertstatus", create_type=False),
+        "postgresql",
+    )
+    op.create_table(
+        "alert_status_counts",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("status", status_type, nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("user_id", "status"),
+    )
+    op.execute(
+        "INSERT INTO alert_status_counts (user_id, status, count) "
+        "SELECT user_id, status, COUNT(*) FROM velocity_alerts GROUP BY user_id, status"
+    )
+
+    op.drop_index("ix_velocity_alerts_user_created", table_name="velocity_alerts")
+    op.create_index(
+        "ix_velocity_alerts_user_created", "velocity_alerts", ["user_id", "created_at", "id"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_velocity_alerts_user_created", table_name="velocity_alerts")
+    op.create_index(
+        "ix_velocity_alerts_user_created", "velocity_alerts", ["user_id", "created_at"]
+    )
+    op.drop_table("alert_status_counts")
@@ -0,0 +1,34 @@
+"""Move every post under its handle's canonical creator
+
+Posts are stored once per handle, under the oldest tracked_creators row for
+it. Posts ingested before that (one copy per tracking user, the first of
+which won the unique instagram_post_id) can sit under another row of the
+handle, where detection never scores them again; repoint them at min(id).
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-16
+"""
+from alembic import op
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "UPDATE creator_posts SET creator_id = ("
+        "SELECT MIN(owner.id) FROM tracked_creators owner "
+        "JOIN tracked_creators creator ON creator.instagram_handle = owner.instagram_handle "
+        "WHERE creator.id = creator_posts.creator_id"
+        ") WHERE creator_id NOT IN ("
+        "SELECT MIN(id) FROM tracked_creators GROUP BY instagram_handle"
+        ")"
+    )
+
+
+def downgrade() -> None:
+    # Which row a post was ingested under is not recorded; nothing to undo
+    pass
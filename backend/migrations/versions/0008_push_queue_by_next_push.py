@@ -0,0 +1,39 @@
+"""Queue pushes by next_push_at
+
+Alerts are now queued for push by setting next_push_at (NULL means not
+queued), and the dispatcher scans PENDING alerts in next_push_at order, so
+alerts of users without a push token or with notifications off no longer
+sit in the queue's index range forever. Pending alerts that were waiting
+for their first attempt are queued for users who can receive pushes.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-16
+"""
+from alembic import op
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "UPDATE velocity_alerts SET next_push_at = created_at "
+        "WHERE status = 'PENDING' AND sent_at IS NULL AND next_push_at IS NULL "
+        "AND user_id IN ("
+        "SELECT id FROM users WHERE push_token IS NOT NULL AND notification_enabled = TRUE"
+        ")"
+    )
+    op.create_index(
+        "ix_velocity_alerts_status_next_push", "velocity_alerts", ["status", "next_push_at"]
+    )
+    op.drop_index("ix_velocity_alerts_status_created", table_name="velocity_alerts")
+
+
+def downgrade() -> None:
+    op.create_index(
+        "ix_velocity_alerts_status_created", "velocity_alerts", ["status", "created_at"]
+    )
+    op.drop_index("ix_velocity_alerts_status_next_push", table_name="velocity_alerts")
@@ -0,0 +1,265 @@
+"""
+EXPLAIN QUERY PLAN harness for the hot query paths.
+
+Builds a throwaway SQLite database from the models, seeds it with a
+realistic spread of creators, posts, snapshots and alerts, then runs the
+real service functions against it: the scanner's due-handle, subscriber and
+cooldown lookups, the velocity engine, the feed subscribers and feed
+refresh, the push queue, snapshot retention and the alerts API. Every
+statement they send is captured and SQLite is asked how it would run it,
+so a change to any of those queries is checked as written. Exits non-zero
+if any of them falls back to a full scan of a table, or if a path stops
+issuing queries at all.
+
+    cd backend && python scripts/check_query_plans.py
+"""
+import asyncio
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# The app's engines are built from settings at import time
+TMP_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{TMP_DIR}/plans.db"
+os.environ.pop("READ_DATABASE_URL", None)
+
+from sqlalchemy import event, insert, select
+
+from app.api.alerts import _encode_cursor, _load_alert_page
+from app.core.database import (
+    Base, async_session, dispose_engines, engine, init_db, read_engine,
+)
+from app.models.models import (
+    User, TrackedCreator, CreatorPost, PostSnapshot, VelocityAlert,
+    AlertStatus, AlertUrgency,
+)
+from app.services.push_queue import FakeTransport, PushDispatcher
+from app.services.retention import run_snapshot_retention
+from app.services.scanner import (
+    _load_active_cooldowns, _load_due_handles, _load_subscribers, _load_users,
+)
+from app.services.velocity import VelocityEngine
+from app.services.velocity_feed import (
+    feed_subscribers, load_velocity_feed, refresh_velocity_feeds,
+)
+
+USERS = 200
+HANDLES = 300
+CREATORS_PER_USER = 8
+POSTS_PER_HANDLE = 30
+SNAPSHOTS_PER_POST = 6
+ALERTS_PER_USER = 40
+
+# "SCAN <table>" on a base table, with or without an index, is a full pass
+FULL_SCAN = re.compile(r"^SCAN (\w+)")
+TABLES = {table.name for table in Base.metadata.sorted_tables}
+EXPLAINABLE = ("SELECT", "UPDATE", "DELETE", "WITH")
+
+# Statements sent while a path runs, keyed by path name. Paths run one at a
+# time, so the path in progress is the one every statement belongs to
+captured: dict[str, list[tuple[str, tuple]]] = {}
+current_path: str | None = None
+
+
+def _capture(conn, cursor, statement, parameters, context, executemany):
+    if current_path is None or executemany:
+        return
+    if not statement.lstrip().upper().startswith(EXPLAINABLE):
+        return
+    # One plan per statement shape; later batches only rebind the parameters
+    if all(sql != statement for sql, _ in captured[current_path]):
+        captured[current_path].append((statement, tuple(parameters or ())))
+
+
+async def seed(conn, now: datetime):
+    rng = random.Random(7)
+    await conn.execute(insert(User), [
+        {"id": u, "username": f"user{u}", "push_token": "token",
+         "notification_enabled": True, "created_at": now}
+        for u in range(1, USERS + 1)
+    ])
+
+    # Every row of a handle shares its next poll, a few of them due per tick
+    next_poll_at = [
+        now + timedelta(minutes=rng.randint(-10, 24 * 60)) for _ in range(HANDLES)
+    ]
+    creators = []
+    for u in range(1, USERS + 1):
+        for handle in rng.sample(range(HANDLES), CREATORS_PER_USER):
+            creators.append({
+                "id": len(creators) + 1, "user_id": u,
+                "instagram_handle": f"creator{handle}", "is_active": True,
+                "next_poll_at": next_poll_at[handle],
+                "created_at": now,
+            })
+    await conn.execute(insert(TrackedCreator), creators)
+
+    posts, snapshots = [], []
+    for c in range(1, HANDLES + 1):
+        for p in range(POSTS_PER_HANDLE):
+            post_id = len(posts) + 1
+            posted_at = now - timedelta(hours=rng.uniform(1, 24 * 60))
+            posts.append({
+                "id": post_id, "creator_id": c, "instagram_post_id": f"p{post_id}",
+                "posted_at": posted_at, "views": 1000, "likes": 10, "comments": 1,
+                "velocity_multiplier": rng.uniform(0, 6), "is_spike": False,
+                "first_seen_at": posted_at, "last_updated_at": now,
+            })
+            for s in range(SNAPSHOTS_PER_POST):
+                snapshots.append({
+                    "post_id": post_id, "views": 1000 * s, "likes": 0, "comments": 0,
+                    "captured_at": posted_at + timedelta(hours=s),
+                })
+    await conn.execute(insert(CreatorPost), posts)
+    await conn.execute(insert(PostSnapshot), snapshots)
+
+    statuses = list(AlertStatus)
+    alerts = []
+    for u in range(1, USERS + 1):
+        for _ in range(ALERTS_PER_USER):
+            status = rng.choice(statuses)
+            created_at = now - timedelta(hours=rng.uniform(0, 24 * 30))
+            alerts.append({
+                "user_id": u, "post_id": rng.randint(1, len(posts)),
+                "creator_handle": "c", "velocity_multiplier": 3.0,
+                "views_at_detection": 1, "hours_since_post": 1.0,
+                "alert_headline": "h", "alert_body": "b", "urgency": AlertUrgency.HIGH,
+                "status": status, "push_attempts": 0, "created_at": created_at,
+                "next_push_at": created_at if status == AlertStatus.PENDING else None,
+            })
+    await conn.execute(insert(VelocityAlert), alerts)
+    await conn.exec_driver_sql("ANALYZE")
+
+
+async def run_hot_paths():
+    """Run each hot path once against the seeded database, capturing its SQL."""
+
+    async def run(name: str, path):
+        global current_path
+        captured[name] = []
+        current_path = name
+        try:
+            async with async_session() as db:
+                await path(db)
+                await db.rollback()
+        finally:
+            current_path = None
+
+    due = {}
+
+    async def due_handles(db):
+        due.update(await _load_due_handles(db))
+
+    await run("scanner: due handles", due_handles)
+
+    scoped = {}
+
+    async def subscribers_by_handle(db):
+        subscribers, owners = await _load_subscribers(db, None, list(due))
+        scoped.update(subscribers=subscribers, owners=owners)
+
+    await run("scanner: subscribers of due handles", subscribers_by_handle)
+    await run(
+        "scanner: subscribers of one user",
+        lambda db: _load_subscribers(db, 1, None),
+    )
+
+    async def analyze(db):
+        owners = await db.scalars(
+            select(TrackedCreator).where(
+                TrackedCreator.id.in_(list(scoped["owners"].values()))
+            )
+        )
+        # Every scored post counts as a spike, so the cooldown path has posts;
+        # scoring dirties them, which flushes before the next query
+        spikes = await VelocityEngine(spike_threshold=0.01).analyze_creators(
+            db, list(owners.all())
+        )
+        scoped["post_ids"] = [
+            spike.post.id for owner_spikes in spikes.values() for spike in owner_spikes
+        ]
+
+    await run("velocity: score due handles", analyze)
+
+    alerting_users = sorted({
+        user_id for user_ids in scoped["subscribers"].values() for user_id in user_ids
+    })
+    await run(
+        "scanner: alert cooldowns",
+        lambda db: _load_active_cooldowns(db, alerting_users, scoped["post_ids"]),
+    )
+    await run("scanner: alerting users", lambda db: _load_users(db, set(alerting_users)))
+    await run(
+        "velocity feed: subscribers",
+        lambda db: feed_subscribers(db, list(scoped["subscribers"])),
+    )
+    await run(
+        "velocity feed: refresh",
+        lambda db: refresh_velocity_feeds(db, alerting_users),
+    )
+    await run("velocity feed: build on read", lambda db: load_velocity_feed(db, 1))
+
+    async def alert_pages(db):
+        first = await _load_alert_page(db, 1, None, None, 20, None)
+        await _load_alert_page(db, 1, None, None, 20, first.next_cursor)
+        await _load_alert_page(
+            db, 1, AlertUrgency.HIGH.value, AlertStatus.PENDING.value, 20,
+            _encode_cursor(first.alerts[-1]),
+        )
+
+    await run("alerts API: feed pages", alert_pages)
+
+    # These two commit in sessions of their own
+    await run("push queue: drain", lambda db: PushDispatcher(FakeTransport()).drain_once())
+    await run("retention: downsample and expire", lambda db: run_snapshot_retention())
+
+
+async def main() -> int:
+    now = datetime.utcnow()
+    await init_db()
+    async with engine.begin() as conn:
+        await seed(conn, now)
+
+    for bound in {engine, read_engine}:
+        event.listen(bound.sync_engine, "before_cursor_execute", _capture)
+    await run_hot_paths()
+
+    failures = 0
+    async with engine.connect() as conn:
+        for name, statements in captured.items():
+            if not statements:
+                failures += 1
+                print(f"FAIL  {name}\n        sent no queries")
+                continue
+            for i, (sql, parameters) in enumerate(statements, 1):
+                result = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", parameters)
+                details = [row[-1] for row in result.all()]
+                scans = [
+                    d for d in details
+                    if (m := FULL_SCAN.match(d)) and m.group(1) in TABLES
+                ]
+                failures += bool(scans)
+                label = name if len(statements) == 1 else f"{name} [{i}]"
+                print(f"{'FAIL' if scans else 'ok  '}  {label}")
+                print(f"        {' '.join(sql.split())[:100]}")
+                for detail in details:
+                    print(f"        {detail}")
+    await dispose_engines()
+
+    print(f"\n{failures} hot queries fall back to a full scan or went missing"
+          if failures else "\nAll hot queries use an index")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(asyncio.run(main()))
+    finally:
+        shutil.rmtree(TMP_DIR, ignore_errors=True)
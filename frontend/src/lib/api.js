@@ -39,6 +39,7 @@ export const api = {
 
   getVelocityFeed: (userId) => request(`/users/${userId}/velocity-feed`),
   triggerScan: (userId) => request(`/users/${userId}/scan`, { method: 'POST' }),
+  getScanJob: (userId, jobId) => request(`/users/${userId}/scan/${jobId}`),
 
   health: () => fetch('/health').then((r) => r.json()),
 }